@@ -11,9 +11,82 @@ angles_log_file = os.path.join(project_dir, 'logs', 'angles.log')
 
 movement_command_file = os.path.join(project_dir, 'wrk', 'movement_command.txt')
 neopixel_command_file = os.path.join(project_dir, 'wrk', 'neopixel_command.txt')
+velocity_command_file = os.path.join(project_dir, 'wrk', 'velocity_command.txt')
 
 cache_dir = os.path.join(project_dir, 'cache')
 
+# precomputed leg angles table, see cybernetic_core/geometry/angles_table.py
+# angles from it differ from the search up to 0.0013 rad, first start builds it for a few seconds
+angles_table_enabled = False
+angles_table_resolution = 0.1 # cm
+# feasibility checks without IK, built from the table, see cybernetic_core/geometry/reachability.py
+# only FenixKinematics.check_leg_target and legs_reachable use it, nothing in the move builders yet
+reachability_map_enabled = False
+# array constraints log one of every N rejections, see cybernetic_core/cybernetic_utils/constraints.py
+constraints_log_sampling = 0 # 0 - nothing is logged
+
+# smooth trajectories between snapshots, streamed to servos, see cybernetic_core/trajectory.py
+trajectory_enabled = False
+trajectory_rate = 50 # Hz, frames sent to servos
+trajectory_commands = ['forward_1', 'forward_2', 'forward_3', 'forward_22', 'forward_32']
+
+# dropping snapshots, that do not change the motion, see cybernetic_core/cybernetic_utils/compaction.py
+sequence_compaction_enabled = False
+sequence_compaction_tolerance = 0.3 # degrees
+sequence_compaction_keep = ['touch', 'balance'] # move types, that are never dropped
+
+# snapshot durations from joint velocity and acceleration limits, see cybernetic_core/rate_scheduler.py
+rate_scheduler_enabled = False
+
+# continuous gait from a velocity command (vx, vy, yaw_rate), see cybernetic_core/gait_engine.py
+gait_engine_enabled = False
+gait_rate = 50 # Hz, engine ticks and frames sent to servos
+
+# bounded cache for leg angles, see cybernetic_core/geometry/angles_cache.py
+angles_cache_size = 20000 # entries, 0 disables the cache
+angles_cache_quantization = 0.01 # cm, calculate_leg_angles rounds to 0.01 anyway
+angles_cache_file = os.path.join(cache_dir, 'leg_angles_cache.pkl') # None to disable warm-loading
+
+# differential IK for small foot steps, see cybernetic_core/geometry/angles_differential.py
+differential_ik_enabled = True
+differential_ik_max_step = 3 # cm, bigger steps are solved by the full search
+differential_ik_limit_margin = 2 # degrees, results closer to angles_limits are solved by the full search
+
+# precomputed gait sequences, see cybernetic_core/gait_library.py
+gait_library_enabled = True
+gait_library_quantization = 0.001 # radians, far below servo resolution
+gait_library_depth = 2 # how many times positions, where gaits end, are walked again
+# direct steps between two-legged gaits instead of exit and start moves, see core/utils/multiphase_moves.py
+gait_transitions_enabled = True
+
+# states of kinematic models, restored without IK, see FenixKinematics.from_position
+kinematics_states_cache_size = 256 # 0 disables
+
+# sequence planning benchmark, see cybernetic_core/benchmark.py
+benchmark_baseline_file = os.path.join(project_dir, 'benchmarks', 'baseline.json')
+benchmark_repeats = 5
+benchmark_regression_threshold = 0.2 # p50 slower than the baseline by this part is a regression
+
+# reading back servo targets, see FenixServos.send_command_to_servos
+servo_write_verification = 'each' # 'each', 'frame', 'sampled' or 'none'
+servo_verification_sampling = 10 # 'sampled': targets are read back after one of every N poses
+# all servos of a pose start together, see FenixServos.send_frame_to_servos
+servo_synchronized_start = False
+# a worker thread for each servo bus, see hardware/bus_executor.py
+servo_parallel_buses = False
+# all servo positions read in one pass, see FenixServos.read_current_angles
+servo_bulk_read = False
+servo_read_deadline = 0.01 # seconds to wait for a reply of one servo
+# servos are sent only targets, that changed, see FenixServos.changed_targets
+servo_shadow_enabled = False
+servo_write_deadband = 0.24 # degrees, one step of a servo
+servo_full_refresh = 20 # every N poses all targets are sent, 0 - never
+
+# logging set up once per process, see core/utils/logging_setup.py
+logging_queue_enabled = True # files are written by a background thread
+logging_levels = {} # logger name -> level, over the ones of logger_config, e.g. {'angles_logger': 'INFO'}
+logging_sampling = {} # logger name -> N, one of every N records is written, e.g. {'angles_logger': 100}
+
 logger_config = {
     'version': 1,
     'formatters': {
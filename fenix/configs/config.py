@@ -76,6 +76,29 @@ fenix = {
     "balance_offset": 1.5,
 }
 
+# joint limits for snapshot durations, see cybernetic_core/rate_scheduler.py
+# 0.16 sec / 60 degrees for 7.4V+ is 375 degrees/s without load
+servo_limits = {
+    "max_velocity": { # degrees/s
+        "gamma": 250,
+        "beta": 250,
+        "alpha": 250,
+        "tetta": 250,
+    },
+    "max_acceleration": { # degrees/s^2
+        "gamma": 1500,
+        "beta": 1500,
+        "alpha": 1500,
+        "tetta": 1500,
+    },
+    # velocity and acceleration are divided by it for a move type, 1 if not set.
+    # Body moves are made by legs on the ground, endpoint moves by raised legs
+    "load": {
+        "body": 1.4,
+        "touch": 2.0,
+    },
+}
+
 limits = {
     "body_forward"        : 7,
     "body_backward"       : 7,
@@ -46,6 +46,12 @@ class CommandsWriter:
             with open(self.command_file, 'w') as f:
                 f.write(f'{self.command_id},{command},{speed}')
                 self.command_id += 1
+
+    def write_velocity(self, vx: float, vy: float, yaw_rate: float) -> None:
+        # parts of the max velocity and yaw rate of the gait engine, from -1 to 1.
+        # Read by the gait engine every tick, so only the last value is kept
+        with open(code_config.velocity_command_file, 'w') as f:
+            f.write(f'{round(vx, 2)},{round(vy, 2)},{round(yaw_rate, 2)}')
     
     def initiate_local_writer(self) -> None:
         try:
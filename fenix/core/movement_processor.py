@@ -1,21 +1,30 @@
 import time
 import datetime
 import pickle
-from typing import Callable, Optional, Union
+from typing import Callable, Optional, Tuple, Union
 import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from cybernetic_core.kinematics import FenixKinematics
+from cybernetic_core.geometry.angles_table import enable_angles_table
+from cybernetic_core.geometry.reachability import enable_reachability_map
+from cybernetic_core.geometry.angles import leg_angles_cache, load_leg_angles_cache, save_leg_angles_cache
 from cybernetic_core.sequence_getter import VirtualFenix
+from cybernetic_core.trajectory import build_trajectory, segment_durations
+from cybernetic_core.gait_engine import GaitEngine
+from cybernetic_core.rate_scheduler import schedule_sequence
+from cybernetic_core.cybernetic_utils.compaction import compact_sequence
 from cybernetic_core.geometry.angles import AnglesException
 from core.utils.multiphase_moves import CommandsForwarder
 from fenix_hardware.fenix_tof_cam import FenixTofCamera
 from fenix_hardware.fenix_tof_sensor import FenixTofs
 from hardware.mpu6050_avg import single_scan
 import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
 import configs.config as config
 import logging.config
 from copy import deepcopy
+import numpy as np
 
 if not code_config.DEBUG:
     from fenix_hardware.fenix_servos import FenixServos
@@ -23,12 +32,15 @@ if not code_config.DEBUG:
 
 class MovementProcessor:
     def __init__(self):
-        logging.config.dictConfig(code_config.logger_config)
+        setup_logging()
         self.logger = logging.getLogger('main_logger')
         self.logger.info('==================START==================')
 
         self.max_processed_command_id = 0
         
+        enable_angles_table(self.logger)
+        enable_reachability_map(self.logger)
+        load_leg_angles_cache(self.logger)
         fk = FenixKinematics()
         self.vf = VirtualFenix(self.logger)
         self.cf = CommandsForwarder()
@@ -100,6 +112,8 @@ class MovementProcessor:
             print(f'Executing move: {command}')
             if command == 'none':
                 time.sleep(0.1)
+            elif command == 'gait':
+                self.run_gait()
             else:    
                 self.run_sequence(command, kwargs)
 
@@ -116,26 +130,141 @@ class MovementProcessor:
             return self.fs.set_servo_values_not_paced_v2
             #return self.fs.set_servo_values_paced
                         
+    def run_trajectory(self, command: str, sequence) -> None:
+        before_trajectory_time = datetime.datetime.now()
+        if command in ['forward_1', 'forward_2', 'forward_3', 'forward_22', 'forward_32']:
+            # same time for every snapshot as set_servo_values_for_running
+            durations = np.full(len(sequence) - 1, config.speed["run"] / 1000)
+        else:
+            durations = segment_durations(sequence, self.speed, self.body_speed)
+        frames = build_trajectory(sequence, durations, code_config.trajectory_rate)
+        frame_time = 1 / code_config.trajectory_rate
+        self.logger.info('[TIMING] Trajectory of %s frames took : %s', len(frames), datetime.datetime.now() - before_trajectory_time)
+
+        self.logger.info('[MOVE] Started: %s', datetime.datetime.now())
+        start_time = datetime.datetime.now()
+        if not code_config.DEBUG:
+            self.fs.set_servo_values_streamed(frames, frame_time)
+        else:
+            time.sleep(len(frames) * frame_time)
+        self.logger.info('[MOVE] finished: %s', datetime.datetime.now())
+        self.logger.info('[TIMING] Step took : %s', datetime.datetime.now() - start_time)
+
+    def run_scheduled(self, sequence) -> None:
+        schedule = schedule_sequence(sequence, self.speed, self.body_speed)
+        schedule.log(self.logger)
+
+        self.logger.info('[MOVE] Started: %s', datetime.datetime.now())
+        start_time = datetime.datetime.now()
+        for move_snapshot, rate, wait_time in zip(sequence, schedule.rates.tolist(), schedule.wait_times.tolist()):
+            self.logger.info('[MP] Moving to %s. Move type: %s', move_snapshot.angles_snapshot, move_snapshot.move_type)
+            if not code_config.DEBUG:
+                self.fs.set_servo_values_scheduled(move_snapshot.angles_snapshot, rate, wait_time)
+            else:
+                time.sleep(wait_time)
+        step_time = datetime.datetime.now() - start_time
+        self.logger.info('[MOVE] finished: %s', datetime.datetime.now())
+        self.logger.info('[SCHEDULE] Actual : %s s. Predicted : %s s', round(step_time.total_seconds(), 3), round(schedule.predicted_time, 3))
+
+    def read_velocity(self) -> Optional[Tuple[float, float, float]]:
+        try:
+            with open(code_config.velocity_command_file, 'r') as f:
+                contents = f.readline().split(',')
+        except OSError:
+            return None
+
+        if len(contents) != 3:
+            return None
+        try:
+            return tuple([float(x) for x in contents])
+        except ValueError:
+            # file is being written
+            return None
+
+    def run_gait(self) -> None:
+        """
+        Ticks the gait engine with the velocity from velocity_command_file,
+        until the velocity is zero and all feet are back on their neutral points
+        """
+        gait_engine = GaitEngine.from_kinematic(self.fenix_position)
+        tick_time = 1 / code_config.gait_rate
+        rate = round(tick_time * 1000)
+        ticks, late_ticks = 0, 0
+        stopping = False
+        self.logger.info('[GAIT] Started: %s', datetime.datetime.now())
+        start_time = datetime.datetime.now()
+        next_time = time.monotonic()
+        while True:
+            velocity = self.read_velocity()
+            if velocity is not None and not stopping:
+                # the file has parts of the max velocity, see CommandsWriter.write_velocity
+                vx, vy, yaw_rate = velocity
+                max_speed, max_yaw_rate = gait_engine.parameters.max_speed, gait_engine.parameters.max_yaw_rate
+                gait_engine.set_velocity(vx * max_speed, vy * max_speed, yaw_rate * max_yaw_rate)
+            if gait_engine.settled:
+                break
+
+            fenix_position = gait_engine.tick(tick_time)
+            if fenix_position is None:
+                if stopping:
+                    self.logger.info('[GAIT] Failed. Could not stop at velocity %s', gait_engine.velocity)
+                    break
+                # feet can not follow the command, the gait goes back to standing
+                self.logger.info('[GAIT] Velocity %s is not reachable. Stopping', gait_engine.velocity)
+                gait_engine.set_velocity(0, 0, 0)
+                stopping = True
+                continue
+
+            if not code_config.DEBUG:
+                # ticks are streamed like trajectory frames, without reading targets back
+                self.fs.send_command_to_servos(fenix_position, rate, verification='none')
+            ticks += 1
+            next_time += tick_time
+            wait_time = next_time - time.monotonic()
+            if wait_time > 0:
+                time.sleep(wait_time)
+            else:
+                late_ticks += 1
+
+        if not code_config.DEBUG and self.fs.verification != 'none':
+            self.fs.verify_targets()
+        self.fenix_position = gait_engine.kinematic_position()
+        self.logger.info('[GAIT] finished: %s. Ticks : %s, late : %s', datetime.datetime.now(), ticks, late_ticks)
+        self.logger.info('[TIMING] Gait took : %s', datetime.datetime.now() - start_time)
+
     def run_sequence(self, command: str, kwargs=None) -> None:        
-        self.logger.info(f'[MOVE] Started run_sequence : {datetime.datetime.now()}')
+        self.logger.info('[MOVE] Started run_sequence : %s', datetime.datetime.now())
         try:            
-            self.logger.info(f'MOVE. Trying command {command}')
+            self.logger.info('MOVE. Trying command %s', command)
             before_sequence_time = datetime.datetime.now()
             #sequence, new_position = get_sequence_for_command_cached(command, self.fenix_position)
             sequence, new_position = self.vf.get_sequence(command, self.fenix_position, kwargs)
             
             if sequence is None:
-                self.logger.info(f'MOVE. Command aborted')
+                self.logger.info('MOVE. Command aborted')
                 return
-            self.logger.info(f'[TIMING] Sequence calculation took : {datetime.datetime.now() - before_sequence_time}')
+            self.logger.info('[TIMING] Sequence calculation took : %s', datetime.datetime.now() - before_sequence_time)
+            if code_config.sequence_compaction_enabled:
+                sequence, compaction_report = compact_sequence(sequence, self.speed, self.body_speed)
+                self.logger.info('[COMPACTION] %s', compaction_report)
+            self.logger.info('[CACHE] Leg angles cache : %s', leg_angles_cache.stats())
             self.fenix_position = deepcopy(new_position)
         except (ValueError, AnglesException) as e:
             print(f'MOVE Failed. Could not process command - {str(e)}')
-            self.logger.info(f'MOVE Failed. Could not process command - {str(e)}')
+            self.logger.info('MOVE Failed. Could not process command - %s', str(e))
             time.sleep(0.3)
             return
         
-        self.logger.info(f'[MOVE] Started: {datetime.datetime.now()}')    
+        if code_config.trajectory_enabled and command in code_config.trajectory_commands:
+            self.run_trajectory(command, sequence)
+            return
+
+        if code_config.rate_scheduler_enabled and command not in ['hit_1', 'hit_2', 'forward_one_legged']:
+            # paced commands wait for servos to reach every snapshot, they are not scheduled
+            self.run_scheduled(sequence)
+            return
+
+        self.logger.info('[MOVE] Started: %s', datetime.datetime.now())    
         start_time = datetime.datetime.now()
         #prev_angles = None
         if not code_config.DEBUG:
@@ -157,15 +286,15 @@ class MovementProcessor:
             else:
                 move_function = original_move_function
 
-            self.logger.info(f'[MP] Moving to {angles}. Move type: {move_snapshot.move_type}')
-            self.logger.info(f'Speed: {self.fs.speed}')
+            self.logger.info('[MP] Moving to %s. Move type: %s', angles, move_snapshot.move_type)
+            self.logger.info('Speed: %s', self.fs.speed)
             if not code_config.DEBUG:
                 move_function(angles)
                 #self.fenix_position = angles[:]
             else:
                 time.sleep(1.0)
-        self.logger.info(f'[MOVE] finished: {datetime.datetime.now()}')
-        self.logger.info(f'[TIMING] Step took : {datetime.datetime.now() - start_time}')
+        self.logger.info('[MOVE] finished: %s', datetime.datetime.now())
+        self.logger.info('[TIMING] Step took : %s', datetime.datetime.now() - start_time)
 
     def move(self):
         try:
@@ -193,6 +322,11 @@ class MovementProcessor:
 
         except KeyboardInterrupt:
             print('Movement stopped')
+        finally:
+            if not code_config.DEBUG:
+                self.fs.close()
+
+        save_leg_angles_cache(self.logger)
 
 if __name__ == '__main__':
     MP = MovementProcessor()
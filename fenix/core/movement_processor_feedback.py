@@ -6,11 +6,15 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from cybernetic_core.kinematics import FenixKinematics
+from cybernetic_core.geometry.angles_table import enable_angles_table
+from cybernetic_core.geometry.reachability import enable_reachability_map
+from cybernetic_core.geometry.angles import leg_angles_cache, load_leg_angles_cache, save_leg_angles_cache
 from cybernetic_core.geometry.angles import build_position_from_servos, convert_legs_angles_to_kinematic_C
 from cybernetic_core.sequence_getter_feedback import get_sequence_for_command, get_angles_for_sequence
 from cybernetic_core.geometry.angles import AnglesException, DistanceException
 from core.utils.multiphase_moves import CommandsForwarder
 import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
 import logging.config
 
 if not code_config.DEBUG:
@@ -19,12 +23,15 @@ if not code_config.DEBUG:
 
 class MovementProcessor:
     def __init__(self):
-        logging.config.dictConfig(code_config.logger_config)
+        setup_logging()
         self.logger = logging.getLogger('main_logger')
         self.logger.info('==================START==================')
 
         self.max_processed_command_id = 0
         
+        enable_angles_table(self.logger)
+        enable_reachability_map(self.logger)
+        load_leg_angles_cache(self.logger)
         fk = FenixKinematics()
         self.cf = CommandsForwarder()
         
@@ -142,8 +149,8 @@ class MovementProcessor:
                 self.logger.info('[MP] Using function set_servo_values_paced_wo_feedback')
                 move_function = self.fs.set_servo_values_paced_wo_feedback
 
-            self.logger.info(f'[MP] Moving to {angles_snapshot}. Move type: {next_angles.move_type}')
-            self.logger.info(f'Speed: {self.fs.speed}')
+            self.logger.info('[MP] Moving to %s. Move type: %s', angles_snapshot, next_angles.move_type)
+            self.logger.info('Speed: %s', self.fs.speed)
 
             new_angles = move_function(angles_snapshot)
             
@@ -154,13 +161,13 @@ class MovementProcessor:
 
 
     def run_sequence(self, command: str, kwargs=None) -> bool:        
-        self.logger.info(f'[MOVE] Started run_sequence : {datetime.datetime.now()}')
-        self.logger.info(f'MOVE. Trying command {command}')
+        self.logger.info('[MOVE] Started run_sequence : %s', datetime.datetime.now())
+        self.logger.info('MOVE. Trying command %s', command)
         
         sequence = get_sequence_for_command(command, kwargs)
         #move = sequence[0]
             
-        self.logger.info(f'[MOVE] Started: {datetime.datetime.now()}')    
+        self.logger.info('[MOVE] Started: %s', datetime.datetime.now())    
         start_time = datetime.datetime.now()
         print(f'Outer Sequence len: {len(sequence)}')
         for move in sequence:
@@ -191,8 +198,9 @@ class MovementProcessor:
                 print('Command failed all attempts. Exiting') 
                 return False
 
-        self.logger.info(f'[MOVE] finished: {datetime.datetime.now()}')
-        self.logger.info(f'[TIMING] Step took : {datetime.datetime.now() - start_time}')
+        self.logger.info('[MOVE] finished: %s', datetime.datetime.now())
+        self.logger.info('[TIMING] Step took : %s', datetime.datetime.now() - start_time)
+        self.logger.info('[CACHE] Leg angles cache : %s', leg_angles_cache.stats())
         return False
 
     def move(self):
@@ -221,6 +229,11 @@ class MovementProcessor:
 
         except KeyboardInterrupt:
             print('Movement stopped')
+        finally:
+            if not code_config.DEBUG:
+                self.fs.close()
+
+        save_leg_angles_cache(self.logger)
 
 if __name__ == '__main__':
     MP = MovementProcessor()
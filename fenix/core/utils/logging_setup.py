@@ -0,0 +1,100 @@
+"""
+Logging is configured once per process, every constructor used to run dictConfig again.
+Logging calls only put records to a queue, a background thread (QueueListener) formats
+them and writes to files, so disk I/O and formatting do not block servo timing.
+Levels and sampling are set per logger in code_config.
+Hot paths log with %-style arguments, a message is built only if the record is written.
+"""
+import sys
+import os
+import queue
+import atexit
+import logging
+import logging.config
+import logging.handlers
+from typing import Optional
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import configs.code_config as code_config
+
+logging_configured = False
+queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+IMMUTABLE_TYPES = (str, int, float, bool, type(None))
+
+
+def is_immutable(value) -> bool:
+    if isinstance(value, tuple):
+        return all(is_immutable(x) for x in value)
+    return isinstance(value, IMMUTABLE_TYPES)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        QueueHandler formats every message in the calling thread. Here it is left to the listener,
+        if arguments can not be changed before it does that (numbers, strings and tuples of them).
+        Lists, positions and other objects are formatted right away
+        """
+        if record.exc_info or not isinstance(record.msg, str) or \
+            not isinstance(record.args, tuple) or not is_immutable(record.args):
+            return super().prepare(record)
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes one of every n records
+    """
+    def __init__(self, n: int):
+        super().__init__()
+        self.n = n
+        self.count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        self.count += 1
+        return (self.count - 1) % self.n == 0
+
+
+def setup_logging() -> None:
+    """
+    Configures loggers from code_config.logger_config, does nothing if already done
+    """
+    global logging_configured, queue_listener
+    if logging_configured:
+        return
+    logging_configured = True
+
+    logging.config.dictConfig(code_config.logger_config)
+    for name, level in code_config.logging_levels.items():
+        logging.getLogger(name).setLevel(level)
+    for name, n in code_config.logging_sampling.items():
+        if n > 1:
+            logging.getLogger(name).addFilter(SamplingFilter(n))
+
+    if not code_config.logging_queue_enabled:
+        return
+
+    log_queue = queue.SimpleQueue()
+    handlers = []
+    for name in code_config.logger_config['loggers']:
+        logger = logging.getLogger(name)
+        for handler in logger.handlers:
+            # the listener gives every record to all handlers, a handler takes records of its own logger
+            handler.addFilter(lambda record, name=name: record.name == name)
+            handlers.append(handler)
+        logger.handlers = [LazyQueueHandler(log_queue)]
+
+    queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """
+    Writes records left in the queue and stops the listener
+    """
+    global queue_listener
+    if queue_listener is not None:
+        queue_listener.stop()
+        queue_listener = None
@@ -1,4 +1,8 @@
 from dataclasses import dataclass
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import configs.code_config as code_config
 
 @dataclass
 class NextStatus:
@@ -13,6 +17,46 @@ class MoveMapping:
     start: NextStatus
     next: dict[int, NextStatus]
     exit: dict[int, NextStatus]
+    # (x, y) direction of the body, transitions between moves are made from it
+    direction: tuple[int, int] = (0, 0)
+
+
+# sum of directions of two moves -> name of the diagonal step between them
+TRANSITION_DIRECTIONS = {
+    (1, 1): 'forward_left',
+    (1, -1): 'forward_right',
+    (-1, 1): 'backward_left',
+    (-1, -1): 'backward_right',
+}
+
+def transition_command(legs: str, direction: tuple[int, int]) -> str:
+    return f'transition_{TRANSITION_DIRECTIONS[direction]}_{legs}'
+
+# command -> (legs, that make the step, direction of the step)
+TRANSITION_COMMANDS = {
+    transition_command(legs, direction): (legs, direction)
+    for direction in TRANSITION_DIRECTIONS
+    for legs in ['13', '24']
+}
+
+def build_transitions(moves: dict[str, MoveMapping]) -> dict[tuple[str, int, str], NextStatus]:
+    """
+    (from move, status, to move) -> status of the new move and the action to get there.
+    In status 1 legs 1, 3 are half a step ahead of the body and legs 2, 4 half a step behind,
+    in status 2 it is the other way. From status 1 of a move legs 2, 4 are put straight
+    to status 2 of the new one, that is a step along the sum of both directions
+    (legs 1, 3 from status 2 the same way). Opposite moves need no step at all, action is None
+    """
+    transitions = {}
+    for from_move, from_mapping in moves.items():
+        for to_move, to_mapping in moves.items():
+            if from_move == to_move:
+                continue
+            direction = tuple([a + b for a, b in zip(from_mapping.direction, to_mapping.direction)])
+            for status, legs, new_status in [(1, '24', 2), (2, '13', 1)]:
+                action = None if direction == (0, 0) else transition_command(legs, direction)
+                transitions[(from_move, status, to_move)] = NextStatus(new_status, action)
+    return transitions
 
 class CommandsForwarder:
     moves = {
@@ -25,7 +69,8 @@ class CommandsForwarder:
             exit = {
                 1: NextStatus(None, 'forward_22'),
                 2: NextStatus(None, 'forward_32'),
-            }
+            },
+            direction=(1, 0),
         ),
         'backward_two_legged': MoveMapping(
             start=NextStatus(1, 'backward_1'),
@@ -36,7 +81,8 @@ class CommandsForwarder:
             exit = {
                 1: NextStatus(None, 'backward_22'),
                 2: NextStatus(None, 'backward_32'),
-            }
+            },
+            direction=(-1, 0),
         ),
         'strafe_right_two_legged': MoveMapping(
             start=NextStatus(1, 'strafe_right_1'),
@@ -47,7 +93,8 @@ class CommandsForwarder:
             exit = {
                 1: NextStatus(None, 'strafe_right_22'),
                 2: NextStatus(None, 'strafe_right_32'),
-            }
+            },
+            direction=(0, -1),
         ),
         'strafe_left_two_legged': MoveMapping(
             start=NextStatus(1, 'strafe_left_1'),
@@ -58,10 +105,12 @@ class CommandsForwarder:
             exit = {
                 1: NextStatus(None, 'strafe_left_22'),
                 2: NextStatus(None, 'strafe_left_32'),
-            }
+            },
+            direction=(0, 1),
         ),
     }
-
+    # computed once, sequences for them are in the gait library
+    transitions = build_transitions(moves)
 
     def __init__(self):
         self.current_move = None
@@ -72,6 +121,9 @@ class CommandsForwarder:
         if self.current_move:
             if self.current_move == move:
                 return self.get_next_move()
+            elif code_config.gait_transitions_enabled and \
+                (self.current_move, self.current_status, move) in self.transitions:
+                return self.get_transition_move(move)
             else:
                 return self.get_exit_move()
         self.current_move = move
@@ -87,6 +139,17 @@ class CommandsForwarder:
         print(f'\tCurrent_status: {self.current_status}. Current_move: {self.current_move}')
         return next.action
         
+    def get_transition_move(self, move):
+        transition = self.transitions[(self.current_move, self.current_status, move)]
+        self.current_move = move
+        self.current_status = transition.status
+        print('Transition')
+        print(f'\tCurrent_status: {self.current_status}. Current_move: {self.current_move}')
+        if transition.action is None:
+            # legs are already where the new move needs them
+            return self.get_next_move()
+        return transition.action
+
     def get_exit_move(self):
         exit_move = self.moves[self.current_move].exit[self.current_status]
         self.current_status = self.current_move = None
@@ -0,0 +1,290 @@
+"""
+Benchmark of sequence planning, runs off the robot in DEBUG mode, servos are not used.
+Every command is planned from a set of start positions and timed a few times.
+Latency percentiles are in ms. Allocations are measured with tracemalloc on one more run:
+peak memory during it, number and size of memory blocks still alive after it.
+Leg angles and kinematics states caches are cleared before every run,
+so the IK hot path is measured, not the caches (--warm keeps them).
+
+    python fenix/cybernetic_core/benchmark.py [--repeats N] [--warm] [--save] [--compare] [command ...]
+
+--save writes results to code_config.benchmark_baseline_file, --compare reports cases
+slower than the baseline by more than benchmark_regression_threshold (exit code 1 then).
+"""
+import sys
+import os
+import io
+import gc
+import json
+import time
+import platform
+import argparse
+import contextlib
+import tracemalloc
+import logging.config
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+import configs.config as cfg
+import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
+
+BENCHMARK_VERSION = 1
+
+# commands of sequence_getter without kwargs
+SEQUENCE_COMMANDS = [
+    'forward_1', 'forward_2', 'forward_22', 'forward_3', 'forward_32',
+    'backward_1', 'backward_2', 'backward_22', 'backward_3', 'backward_32',
+    'strafe_right_1', 'strafe_right_2', 'strafe_right_22', 'strafe_right_3', 'strafe_right_32',
+    'strafe_left_1', 'strafe_left_2', 'strafe_left_22', 'strafe_left_3', 'strafe_left_32',
+    'transition_forward_left_13', 'transition_forward_left_24',
+    'diagonal_forward_right', 'diagonal_forward_left', 'diagonal_backward_right', 'diagonal_backward_left',
+    'approach_obstacle', 'forward_one_legged', 'touching',
+    'battle_mode', 'sentry_mode', 'walking_mode', 'run_mode',
+    'left_turn_in_move', 'right_turn_in_move',
+    'body_forward_8', 'body_backward_8', 'body_forward', 'body_backward', 'body_left', 'body_right',
+    'body_to_center', 'up', 'down', 'up_4', 'up_16', 'down_16', 'kneel', 'climb_2',
+    'look_up', 'look_down', 'look_left', 'look_right', 'sight_to_normal',
+    'turn_left_two_legged', 'turn_right_two_legged',
+    'reposition_x_up', 'reposition_x_down', 'reposition_y_up', 'reposition_y_down',
+    'start', 'end', 'reset', 'hit_1', 'hit_2', 'climb_2_legs', 'descend_2_legs', 'back_8', 'back_legs',
+]
+# commands of sequence_getter_feedback, moves reading sensor files are skipped
+FEEDBACK_COMMANDS = ['up', 'down', 'forward_one_legged', 'run_mode']
+SENSOR_MOVE_TYPES = ['balance', 'down_leg_up']
+# start position name -> commands to get there from the initial position
+START_POSITIONS = {
+    'initial': [],
+    'run_mode': ['run_mode'],
+    'forward_status_1': ['forward_1'],
+    'forward_status_2': ['forward_1', 'forward_2'],
+}
+# foot points (delta_x, delta_z) of the find_angles case, cm
+FIND_ANGLES_POINTS = [(x, z) for x in range(6, 26, 4) for z in range(-18, 2, 4)]
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    start: str
+    function: Callable
+
+
+def quiet():
+    # kinematics prints a lot
+    return contextlib.redirect_stdout(io.StringIO())
+
+def clear_caches() -> None:
+    from cybernetic_core.geometry.angles import leg_angles_cache
+    from cybernetic_core.kinematics import kinematics_states
+    leg_angles_cache.clear()
+    kinematics_states.clear()
+
+def benchmark_fingerprint() -> str:
+    """
+    Everything results depend on besides the code and the machine
+    """
+    from cybernetic_core.geometry.angles_cache import config_fingerprint
+    return config_fingerprint({
+        'version': BENCHMARK_VERSION,
+        'leg': cfg.leg,
+        'start': cfg.start,
+        'modes': cfg.modes,
+        'moves': cfg.moves,
+        'angles_limits': cfg.angles_limits,
+        'angles_table_enabled': code_config.angles_table_enabled,
+        'reachability_map_enabled': code_config.reachability_map_enabled,
+        'differential_ik_enabled': code_config.differential_ik_enabled,
+    })
+
+def start_positions(logger) -> Dict:
+    from cybernetic_core.kinematics import FenixKinematics
+    from cybernetic_core.sequence_getter import get_sequence_for_command_cached
+
+    with quiet():
+        initial_position = FenixKinematics().current_position
+    positions = {}
+    for name, commands in START_POSITIONS.items():
+        fenix_position = initial_position
+        try:
+            with quiet():
+                for command in commands:
+                    _, fenix_position = get_sequence_for_command_cached(command, fenix_position)
+        except Exception as e:
+            logger.info(f'Benchmark. Start position {name} failed : {e}')
+            continue
+        positions[name] = fenix_position
+    return positions
+
+def build_cases(commands: Optional[List[str]] = None) -> List[BenchmarkCase]:
+    from cybernetic_core.kinematics import FenixKinematics
+    from cybernetic_core.sequence_getter import get_sequence_for_command_cached
+    from cybernetic_core.sequence_getter_feedback import get_sequence_for_command, get_angles_for_sequence
+    from cybernetic_core.geometry.angles import find_angles
+
+    def sequence_case(command):
+        return lambda fenix_position: get_sequence_for_command_cached(command, fenix_position)
+
+    def feedback_case(command):
+        def run(fenix_position):
+            for move in get_sequence_for_command(command):
+                if move.move_type in SENSOR_MOVE_TYPES:
+                    continue
+                sequence = get_angles_for_sequence(move, fenix_position)
+                if len(sequence) > 0:
+                    fenix_position = sequence[-1].angles_snapshot
+        return run
+
+    def turn(fenix_position):
+        FenixKinematics.from_position(fenix_position).turn(25)
+
+    def find_angles_grid(_):
+        logger = logging.getLogger('angles_logger')
+        for delta_x, delta_z in FIND_ANGLES_POINTS:
+            try:
+                find_angles(delta_x, delta_z, logger)
+            except Exception:
+                pass
+
+    cases = []
+    for command in SEQUENCE_COMMANDS:
+        if commands is None or command in commands:
+            for start in START_POSITIONS:
+                cases.append(BenchmarkCase(f'sequence:{command}', start, sequence_case(command)))
+    for command in FEEDBACK_COMMANDS:
+        if commands is None or command in commands:
+            for start in START_POSITIONS:
+                cases.append(BenchmarkCase(f'feedback:{command}', start, feedback_case(command)))
+    if commands is None or 'turn' in commands:
+        for start in START_POSITIONS:
+            cases.append(BenchmarkCase('kinematics:turn', start, turn))
+    if commands is None or 'find_angles' in commands:
+        cases.append(BenchmarkCase('angles:find_angles', 'initial', find_angles_grid))
+    return cases
+
+def run_case(case: BenchmarkCase, fenix_position, repeats: int, warm: bool) -> Dict:
+    times = []
+    # the first run is not counted, lazy imports and tables are loaded in it
+    for _ in range(repeats + 1):
+        if not warm:
+            clear_caches()
+        start_time = time.perf_counter()
+        try:
+            with quiet():
+                case.function(fenix_position)
+        except Exception as e:
+            return {'error': f'{type(e).__name__}: {e}'}
+        times.append((time.perf_counter() - start_time) * 1000)
+    times = np.array(times[1:])
+
+    if not warm:
+        clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    with quiet():
+        case.function(fenix_position)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = after.compare_to(before, 'lineno')
+
+    return {
+        'p50_ms': round(float(np.percentile(times, 50)), 3),
+        'p90_ms': round(float(np.percentile(times, 90)), 3),
+        'p99_ms': round(float(np.percentile(times, 99)), 3),
+        'max_ms': round(float(times.max()), 3),
+        'mean_ms': round(float(times.mean()), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'retained_blocks': sum([stat.count_diff for stat in retained]),
+        'retained_kb': round(sum([stat.size_diff for stat in retained]) / 1024, 1),
+    }
+
+def run_benchmark(repeats: int, warm: bool = False, commands: Optional[List[str]] = None, logger=None) -> Dict:
+    if logger is None:
+        logger = logging.getLogger('main_logger')
+    positions = start_positions(logger)
+    results = {}
+    for case in build_cases(commands):
+        if case.start not in positions:
+            continue
+        key = f'{case.name}@{case.start}'
+        results[key] = run_case(case, positions[case.start], repeats, warm)
+        print(f'{key:60s} {format_result(results[key])}')
+    return {
+        'fingerprint': benchmark_fingerprint(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeats': repeats,
+        'warm': warm,
+        'cases': results,
+    }
+
+def format_result(result: Dict) -> str:
+    if 'error' in result:
+        return f'failed : {result["error"]}'
+    return f'p50 {result["p50_ms"]:8.2f} ms  p90 {result["p90_ms"]:8.2f}  p99 {result["p99_ms"]:8.2f}  ' \
+        f'peak {result["peak_kb"]:8.1f} KB  retained blocks {result["retained_blocks"]:6d}'
+
+def compare_with_baseline(benchmark: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Cases with p50 slower than in the baseline by more than threshold (a part of the baseline),
+    and cases, that failed only now
+    """
+    if baseline.get('fingerprint') != benchmark['fingerprint']:
+        print('Baseline was made with another config, comparison is not exact')
+    regressions = []
+    for key, result in benchmark['cases'].items():
+        base = baseline['cases'].get(key)
+        if base is None:
+            continue
+        if 'error' in result:
+            if 'error' not in base:
+                regressions.append(f'{key} failed : {result["error"]}')
+        elif 'error' not in base and result['p50_ms'] > base['p50_ms'] * (1 + threshold):
+            regressions.append(f'{key} p50 {base["p50_ms"]} -> {result["p50_ms"]} ms')
+    return regressions
+
+
+if __name__ == '__main__':
+    code_config.DEBUG = True
+    setup_logging()
+    logger = logging.getLogger('main_logger')
+
+    parser = argparse.ArgumentParser(description='Sequence planning benchmark')
+    parser.add_argument('commands', nargs='*', help='commands to run, all if not set')
+    parser.add_argument('--repeats', type=int, default=code_config.benchmark_repeats)
+    parser.add_argument('--warm', action='store_true', help='do not clear caches between runs')
+    parser.add_argument('--save', action='store_true', help='save results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare results with the baseline')
+    args = parser.parse_args()
+
+    from cybernetic_core.geometry.angles_table import enable_angles_table
+    from cybernetic_core.geometry.reachability import enable_reachability_map
+    enable_angles_table(logger)
+    enable_reachability_map(logger)
+
+    benchmark = run_benchmark(args.repeats, args.warm, args.commands or None, logger)
+    filename = code_config.benchmark_baseline_file
+
+    regressions = []
+    if args.compare:
+        if not os.path.exists(filename):
+            print(f'No baseline {filename}')
+        else:
+            with open(filename, 'r') as f:
+                regressions = compare_with_baseline(benchmark, json.load(f), code_config.benchmark_regression_threshold)
+            print(f'Regressions : {len(regressions)}')
+            for regression in regressions:
+                print(f'\t{regression}')
+
+    if args.save:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as f:
+            json.dump(benchmark, f, indent=2)
+        print(f'Baseline saved to {filename}')
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,102 @@
+"""
+Compaction of a sequence before it is executed.
+Every snapshot is a command to all 16 servos and a wait, so snapshots, that do not change
+the motion, are dropped:
+- a snapshot closer than the tolerance to the previous one, there is nothing to move,
+- a snapshot on the joint space line between its neighbours: servos go along a straight
+  line in joint space, so the motion is the same, only without a stop in the middle.
+The last snapshot and snapshots of move types in code_config.sequence_compaction_keep
+are never dropped. Snapshots are merged only with the next one of the same move type,
+as move types are executed with different speeds.
+"""
+import sys
+import os
+from dataclasses import dataclass
+from typing import List, Tuple
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+
+from cybernetic_core.cybernetic_utils.history import SnapshotSequence, move_type_code
+import configs.config as cfg
+import configs.code_config as code_config
+
+
+@dataclass
+class CompactionReport:
+    snapshots_before: int
+    snapshots_after: int
+    # seconds, estimated with rates from speed as set_servo_values_not_paced_v2 does
+    time_before: float
+    time_after: float
+
+    def __str__(self):
+        return f'Snapshots : {self.snapshots_before} -> {self.snapshots_after} ' \
+            f'({self.snapshots_before - self.snapshots_after} servo commands saved). ' \
+            f'Estimated time : {round(self.time_before, 3)} -> {round(self.time_after, 3)} s ' \
+            f'({round(self.time_before - self.time_after, 3)} s saved)'
+
+
+def line_deviation(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> float:
+    """
+    Biggest distance of a joint from the segment between start and end, degrees.
+    points has shape (K, 16)
+    """
+    direction = end - start
+    length = np.dot(direction, direction)
+    if length == 0:
+        return float(np.abs(points - start).max())
+    t = np.clip((points - start) @ direction / length, 0, 1)
+    return float(np.abs(points - start - t[:, None] * direction).max())
+
+def estimated_time(sequence: SnapshotSequence, speed: int, body_speed: int = None) -> float:
+    # imported here, trajectory imports kinematics, that imports history
+    from cybernetic_core.trajectory import segment_durations
+    rates = np.round(segment_durations(sequence, speed, body_speed) * 1000)
+    return float(np.maximum(0, rates / 1000 - cfg.fenix['movement_command_advance_ms']).sum())
+
+def compact_sequence(
+        sequence: SnapshotSequence, 
+        speed: int, 
+        body_speed: int = None, 
+        tolerance: float = None
+    ) -> Tuple[SnapshotSequence, CompactionReport]:
+    """
+    tolerance: degrees a joint may be away from the motion of the original sequence.
+    speed and body_speed are used only for the report
+    """
+    if tolerance is None:
+        tolerance = code_config.sequence_compaction_tolerance
+    servo_angles = np.asarray(sequence.servo_angles, dtype=float)
+    codes = sequence.move_type_codes
+    keep_codes = {move_type_code(move_type) for move_type in code_config.sequence_compaction_keep}
+
+    kept: List[int] = [0]
+    # snapshots dropped since the last kept one
+    dropped: List[int] = []
+    for i in range(1, len(servo_angles) - 1):
+        if int(codes[i]) in keep_codes:
+            kept.append(i)
+            dropped = []
+            continue
+
+        anchor = servo_angles[kept[-1]]
+        no_move = np.abs(servo_angles[i] - anchor).max() < tolerance
+        on_line = codes[i] == codes[i + 1] and \
+            line_deviation(servo_angles[dropped + [i]], anchor, servo_angles[i + 1]) < tolerance
+        if no_move or on_line:
+            dropped.append(i)
+        else:
+            kept.append(i)
+            dropped = []
+    if len(servo_angles) > 1:
+        kept.append(len(servo_angles) - 1)
+
+    compacted = SnapshotSequence(servo_angles[kept], codes[kept])
+    report = CompactionReport(
+        len(sequence),
+        len(compacted),
+        estimated_time(sequence, speed, body_speed),
+        estimated_time(compacted, speed, body_speed)
+    )
+    return compacted, report
@@ -1,4 +1,5 @@
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+import numpy as np
 from configs import config as cfg
 import configs.code_config as code_config
 import logging.config
@@ -166,4 +167,141 @@ def leg_angles_correct_2j(
             return False
     
     #logger.info(f'Good angles : {alpha}, {beta}')
-    return True
\ No newline at end of file
+    return True
+
+# violation codes of the array constraints, bit flags, 0 means correct
+VIOLATION_ALPHA_MIN = 1
+VIOLATION_ALPHA_MAX = 2
+VIOLATION_BETA_MIN = 4
+VIOLATION_BETA_MAX = 8
+VIOLATION_GAMMA_MIN = 16
+VIOLATION_GAMMA_MAX = 32
+VIOLATION_TETTA_ALPHA = 64
+VIOLATION_TETTAS = 128
+
+VIOLATION_NAMES = {
+    VIOLATION_ALPHA_MIN: 'alpha min',
+    VIOLATION_ALPHA_MAX: 'alpha max',
+    VIOLATION_BETA_MIN: 'beta min',
+    VIOLATION_BETA_MAX: 'beta max',
+    VIOLATION_GAMMA_MIN: 'gamma min',
+    VIOLATION_GAMMA_MAX: 'gamma max',
+    VIOLATION_TETTA_ALPHA: 'alpha + tetta',
+    VIOLATION_TETTAS: 'tettas',
+}
+
+
+def describe_violations(code: int) -> List[str]:
+    return [name for flag, name in VIOLATION_NAMES.items() if int(code) & flag]
+
+# rejections counted by log_violations_sampled
+rejections_count = 0
+
+def log_violations_sampled(violations: np.ndarray, logger=None, **values) -> None:
+    """
+    Logs one of every code_config.constraints_log_sampling rejections
+    with its violations and values (arrays of the shape of violations).
+    Nothing is logged, if sampling is 0
+    """
+    global rejections_count
+    sampling = code_config.constraints_log_sampling
+    if sampling <= 0:
+        return
+    rejected = np.flatnonzero(violations)
+    if len(rejected) == 0:
+        return
+    previous_count = rejections_count
+    rejections_count += len(rejected)
+    if rejections_count // sampling == previous_count // sampling:
+        return
+
+    # the rejection, that hit the sampling step
+    i = rejected[sampling - 1 - previous_count % sampling]
+    code = violations.flat[i]
+    sample = {name: round(float(np.broadcast_to(value, violations.shape).flat[i]), 2) for name, value in values.items()}
+    message = f'Rejected {describe_violations(code)} : {sample}. {len(rejected)} of {violations.size} rejected'
+    if logger is not None:
+        logger.info(message)
+    else:
+        print(message)
+
+def tettas_violations_batch(tettas: np.ndarray, logger=None) -> np.ndarray:
+    """
+    Array version of tettas_correct. tettas has shape (..., 4), servo degrees.
+    Returns violation codes of shape (..., 4): VIOLATION_TETTAS for a leg,
+    which is more than 115 degrees ahead of the next one
+    """
+    tettas = np.asarray(tettas, dtype=float)
+    next_tettas = np.roll(tettas, -1, axis=-1)
+    violations = np.where(tettas - next_tettas > 115, VIOLATION_TETTAS, 0).astype(np.uint8)
+    log_violations_sampled(violations, logger, tetta=tettas, next_tetta=next_tettas)
+    return violations
+
+def tettas_correct_batch(tettas: np.ndarray, logger=None) -> np.ndarray:
+    """
+    Array version of tettas_correct. tettas has shape (..., 4), degrees.
+    Returns a boolean mask of shape (...), see log_violations_sampled for logging
+    """
+    return ~np.any(tettas_violations_batch(tettas, logger), axis=-1)
+
+def leg_angles_violations_batch(
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    tetta: Optional[np.ndarray] = None,
+    logger = None
+    ) -> np.ndarray:
+    """
+    Array version of leg_angles_correct, all arguments broadcast together, degrees.
+    Returns violation codes (VIOLATION_* flags combined), nan violates both limits
+    """
+    alpha = np.asarray(alpha, dtype=float)
+    beta = np.asarray(beta, dtype=float)
+    gamma = np.asarray(gamma, dtype=float)
+    limits = cfg.angles_limits
+
+    violations = np.zeros(np.broadcast_shapes(alpha.shape, beta.shape, gamma.shape), dtype=np.uint8)
+    for value, name, flag_min, flag_max in [
+        (alpha, 'alpha', VIOLATION_ALPHA_MIN, VIOLATION_ALPHA_MAX),
+        (beta, 'beta', VIOLATION_BETA_MIN, VIOLATION_BETA_MAX),
+        (gamma, 'gamma', VIOLATION_GAMMA_MIN, VIOLATION_GAMMA_MAX),
+    ]:
+        # negated, so that nan violates the limits as it did in boolean masks
+        violations |= np.where(~(value >= limits[name]["min"]), flag_min, 0).astype(np.uint8)
+        violations |= np.where(~(value <= limits[name]["max"]), flag_max, 0).astype(np.uint8)
+
+    if tetta is not None:
+        abs_tetta = np.abs(np.asarray(tetta, dtype=float))
+        tetta_limit = np.where(alpha > 90, 50, np.where(alpha > 30, 70, 90))
+        violations = violations | np.where(~(abs_tetta <= tetta_limit), VIOLATION_TETTA_ALPHA, 0).astype(np.uint8)
+
+    values = {'alpha': alpha, 'beta': beta, 'gamma': gamma}
+    if tetta is not None:
+        values['tetta'] = tetta
+    log_violations_sampled(violations, logger, **values)
+    return violations
+
+def leg_angles_correct_batch(
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    tetta: Optional[np.ndarray] = None,
+    logger = None
+    ) -> np.ndarray:
+    """
+    Array version of leg_angles_correct, all arguments broadcast together.
+    Returns a boolean mask, see log_violations_sampled for logging
+    """
+    return leg_angles_violations_batch(alpha, beta, gamma, tetta, logger) == 0
+
+def joint_margins_batch(alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray) -> np.ndarray:
+    """
+    Degrees from alpha, beta, gamma (degrees) to the closest of angles_limits,
+    negative where a limit is violated
+    """
+    margins = []
+    for value, name in [(alpha, 'alpha'), (beta, 'beta'), (gamma, 'gamma')]:
+        limits = cfg.angles_limits[name]
+        value = np.asarray(value, dtype=float)
+        margins.append(np.minimum(value - limits["min"], limits["max"] - value))
+    return np.min(np.stack(margins), axis=0)
@@ -0,0 +1,145 @@
+"""
+Snapshot history of FenixKinematics stored as arrays instead of lists of objects.
+Angles are kept as N x 16 (servo order, radians), foot points as N x 4 x 3
+and move types as small integer codes. Servo angles (degrees) are converted
+once per snapshot, when it is added, so the sequence is a view, not a rebuild.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cybernetic_core.geometry.angles import FenixPosition
+from cybernetic_core.cybernetic_utils.moves import MoveSnapshot
+
+# move type codes are shared by all histories, so they can be compared between them
+MOVE_TYPES: List[str] = []
+MOVE_TYPE_CODES = {}
+
+
+def move_type_code(move_type: str) -> int:
+    code = MOVE_TYPE_CODES.get(move_type)
+    if code is None:
+        code = len(MOVE_TYPES)
+        MOVE_TYPES.append(move_type)
+        MOVE_TYPE_CODES[move_type] = code
+    return code
+
+
+class SnapshotHistory:
+    def __init__(self, capacity: int = 64):
+        self.length = 0
+        self._angles = np.empty((capacity, 16))
+        self._servo_angles = np.empty((capacity, 16))
+        self._D_points = np.empty((capacity, 4, 3))
+        self._move_types = np.empty(capacity, dtype=np.int16)
+        # snapshot index -> exception raised when converting it to servo angles
+        self.errors: Dict[int, Exception] = {}
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def capacity(self) -> int:
+        return len(self._angles)
+
+    def _grow(self) -> None:
+        capacity = max(2 * self.capacity, 16)
+        for name in ['_angles', '_servo_angles', '_D_points', '_move_types']:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.length] = old[:self.length]
+            setattr(self, name, new)
+
+    def append(
+            self, 
+            move_type: str, 
+            angles, 
+            D_points, 
+            servo_angles=None, 
+            error: Optional[Exception] = None
+        ) -> None:
+        """
+        angles: 16 kinematic angles in servo order
+        D_points: 4 points (x, y, z) of legs 1 to 4
+        servo_angles: 16 converted angles, None if conversion failed with error
+        """
+        if self.length == self.capacity:
+            self._grow()
+        i = self.length
+        self._angles[i] = angles
+        self._D_points[i] = D_points
+        if servo_angles is None:
+            self._servo_angles[i] = np.nan
+        else:
+            self._servo_angles[i] = servo_angles
+        if error is not None:
+            self.errors[i] = error
+        self._move_types[i] = move_type_code(move_type)
+        self.length += 1
+
+    def clear(self) -> None:
+        # sequences and views taken before are slices of the buffers,
+        # new ones are made, so that new snapshots do not overwrite them
+        for name in ['_angles', '_servo_angles', '_D_points', '_move_types']:
+            old = getattr(self, name)
+            setattr(self, name, np.empty_like(old))
+        self.length = 0
+        self.errors = {}
+
+    # views below do not follow later appends, take them again after adding snapshots
+    @property
+    def angles(self) -> np.ndarray:
+        return self._angles[:self.length]
+
+    @property
+    def servo_angles(self) -> np.ndarray:
+        return self._servo_angles[:self.length]
+
+    @property
+    def D_points(self) -> np.ndarray:
+        return self._D_points[:self.length]
+
+    @property
+    def move_type_codes(self) -> np.ndarray:
+        return self._move_types[:self.length]
+
+    def move_type(self, i: int) -> str:
+        return MOVE_TYPES[self.move_type_codes[i]]
+
+    def first_error(self) -> Optional[Exception]:
+        if not self.errors:
+            return None
+        return self.errors[min(self.errors)]
+
+    def sequence(self) -> 'SnapshotSequence':
+        return SnapshotSequence(self.servo_angles, self.move_type_codes)
+
+
+class SnapshotSequence:
+    """
+    Read-only list of MoveSnapshot with servo angles (degrees), on top of history arrays.
+    Supports len, indexing, slicing and iteration, snapshots are built on access
+    """
+    __slots__ = ('servo_angles', 'move_type_codes')
+
+    def __init__(self, servo_angles: np.ndarray, move_type_codes: np.ndarray):
+        self.servo_angles = servo_angles
+        self.move_type_codes = move_type_codes
+
+    def __len__(self):
+        return len(self.servo_angles)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SnapshotSequence(self.servo_angles[i], self.move_type_codes[i])
+        return MoveSnapshot(
+            MOVE_TYPES[self.move_type_codes[i]], 
+            FenixPosition.from_servo(self.servo_angles[i].tolist())
+        )
+
+    def __iter__(self):
+        for code, angles in zip(self.move_type_codes.tolist(), self.servo_angles.tolist()):
+            yield MoveSnapshot(MOVE_TYPES[code], FenixPosition.from_servo(angles))
+
+    def __repr__(self):
+        return f'SnapshotSequence({list(self)})'
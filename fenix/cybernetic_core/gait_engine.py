@@ -0,0 +1,227 @@
+"""
+Phase based gait driven by a continuous velocity command (vx, vy, yaw_rate).
+Every control tick feet are moved in body coordinates: feet on the ground
+go against the commanded velocity, raised feet go along an arc to the point,
+where they will be in the middle of the next stance. Legs 1, 3 and 2, 4
+are diagonal pairs half a cycle apart. Speed and direction can be changed
+at any tick, no start and exit moves are needed.
+"""
+import sys
+import os
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from cybernetic_core.geometry.angles import FenixPosition, convert_legs_angles_C, convert_legs_angles_to_kinematic_C
+from cybernetic_core.trajectory import convert_legs_angles_to_kinematic_batch, feet_points_batch, solve_frames
+import configs.config as cfg
+
+# feet closer to their targets are considered there, cm
+SETTLED_DISTANCE = 0.05
+# how fast foot angles go back to the ones of the starting position, degrees/s
+FOOT_ANGLE_RATE = 50
+
+
+def smooth_step(x):
+    """
+    0 to 1 with zero speed at both ends
+    """
+    return 3 * x ** 2 - 2 * x ** 3
+
+
+@dataclass
+class GaitParameters:
+    # seconds of a full cycle, every leg is raised once
+    period: float = 4 * cfg.speed["run"] / 1000
+    # part of the cycle a foot is on the ground
+    duty_factor: float = 0.5
+    # cm
+    step_height: float = cfg.fenix["leg_up"][2]
+    # longest way of a foot on the ground, cm
+    max_stride: float = 2 * cfg.moves["forward_body_2_leg_cm"]
+    # biggest turn of the body during one stance, degrees
+    max_turn: float = 25
+    # leg number -> phase, when its stance starts
+    phase_offsets: Dict[int, float] = field(default_factory=lambda: {1: 0.0, 3: 0.0, 2: 0.5, 4: 0.5})
+
+    @property
+    def stance_time(self) -> float:
+        return self.period * self.duty_factor
+
+    @property
+    def swing_time(self) -> float:
+        return self.period * (1 - self.duty_factor)
+
+    @property
+    def max_speed(self) -> float:
+        """
+        cm/s, a foot on the ground makes max_stride during one stance
+        """
+        return self.max_stride / self.stance_time
+
+    @property
+    def max_yaw_rate(self) -> float:
+        """
+        degrees/s
+        """
+        return self.max_turn / self.stance_time
+
+
+class GaitEngine:
+    def __init__(self, fenix_position: FenixPosition, parameters: GaitParameters = None):
+        """
+        fenix_position: servo angles (degrees), see from_kinematic for kinematic ones
+        """
+        self.parameters = parameters if parameters is not None else GaitParameters()
+        # feet of the starting position are the neutral ones, strides are around them
+        self.neutral_feet = feet_points_batch(np.array([fenix_position.to_servo()]))[0]
+        self.feet = self.neutral_feet.copy()
+        self.servo_angles = np.array(fenix_position.to_servo())
+        self.neutral_foot_angles = self.current_foot_angles()
+        self.phase = 0.0
+        self.velocity = (0.0, 0.0, 0.0)
+        # raised feet without the arc height
+        self.swing_feet = self.feet.copy()
+        # progress of the swing, when a leg was raised, arc is made for the rest
+        self.swing_start = np.zeros(4)
+        self.standing = True
+
+    @classmethod
+    def from_kinematic(cls, fenix_position: FenixPosition, parameters: GaitParameters = None) -> 'GaitEngine':
+        """
+        fenix_position: kinematic angles (radians), as FenixKinematics.current_position
+        """
+        return cls(convert_legs_angles_C(fenix_position), parameters)
+
+    def kinematic_position(self) -> FenixPosition:
+        """
+        Current kinematic angles (radians), for FenixKinematics.from_position
+        """
+        return convert_legs_angles_to_kinematic_C(FenixPosition.from_servo(self.servo_angles.tolist()))
+
+    def set_velocity(self, vx: float, vy: float, yaw_rate: float) -> Tuple[float, float, float]:
+        """
+        vx, vy: cm/s in body coordinates, yaw_rate: degrees/s.
+        Limited by the stride and turn a foot can make during one stance.
+        Returns the velocity that is used
+        """
+        max_speed = self.parameters.max_speed
+        speed = math.hypot(vx, vy)
+        if speed > max_speed:
+            vx, vy = vx * max_speed / speed, vy * max_speed / speed
+        max_yaw_rate = self.parameters.max_yaw_rate
+        yaw_rate = max(-max_yaw_rate, min(max_yaw_rate, yaw_rate))
+        self.velocity = (vx, vy, yaw_rate)
+        return self.velocity
+
+    @property
+    def settled(self) -> bool:
+        """
+        Standing still: no velocity and all feet on their neutral points
+        """
+        return self.velocity == (0.0, 0.0, 0.0) and \
+            np.all(np.abs(self.feet - self.neutral_feet) < SETTLED_DISTANCE)
+
+    def leg_phases(self, phase: float) -> np.ndarray:
+        return np.array([(phase + self.parameters.phase_offsets[leg_num]) % 1 for leg_num in range(1, 5)])
+
+    def body_motion(self, points: np.ndarray, dt: float) -> np.ndarray:
+        """
+        Points on the ground as seen from the body, after it moved with velocity for dt
+        """
+        vx, vy, yaw_rate = self.velocity
+        angle = -math.radians(yaw_rate) * dt
+        rotation = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+        moved = points.copy()
+        moved[:, :2] = points[:, :2] @ rotation.T - np.array([vx, vy]) * dt
+        return moved
+
+    def touchdown_feet(self) -> np.ndarray:
+        """
+        Neutral feet moved half a stance ahead, so they pass neutral points in the middle of it
+        """
+        return self.body_motion(self.neutral_feet, -self.parameters.stance_time / 2)
+
+    def current_foot_angles(self) -> np.ndarray:
+        """
+        alpha + beta + gamma of every leg, degrees
+        """
+        _, alpha, beta, gamma = convert_legs_angles_to_kinematic_batch(self.servo_angles[None])
+        return np.degrees(alpha + beta + gamma)[0]
+
+    def foot_angles(self, dt: float) -> np.ndarray:
+        """
+        Current foot angles moved to the neutral ones by FOOT_ANGLE_RATE.
+        Near the border of the workspace the closest reachable angle is taken,
+        starting from the current one it does not jump from one side to another
+        """
+        current = self.current_foot_angles()
+        max_change = FOOT_ANGLE_RATE * dt
+        return current + np.clip(self.neutral_foot_angles - current, -max_change, max_change)
+
+    def tick(self, dt: float) -> Optional[FenixPosition]:
+        """
+        Moves the gait by dt seconds. Returns servo angles for it
+        or None if the feet can not be reached, then nothing is changed
+        """
+        if self.settled:
+            self.standing = True
+            return FenixPosition.from_servo(self.servo_angles.tolist())
+
+        duty_factor = self.parameters.duty_factor
+        swing_feet = self.swing_feet.copy()
+        swing_start = self.swing_start.copy()
+        if self.standing:
+            # neutral feet are in the middle of a stance: legs on the ground start there,
+            # raised legs make the second half of a swing
+            start_phase = duty_factor / 2
+            started = self.leg_phases(start_phase) >= duty_factor
+            swing_feet[started] = self.feet[started]
+            swing_start[started] = (self.leg_phases(start_phase)[started] - duty_factor) / (1 - duty_factor)
+        else:
+            start_phase = self.phase
+
+        phase = (start_phase + dt / self.parameters.period) % 1
+        old_phases = self.leg_phases(start_phase)
+        new_phases = self.leg_phases(phase)
+        swing = new_phases >= duty_factor
+
+        feet = self.body_motion(self.feet, dt)
+        # legs, that are raised on this tick, start their arc where they are
+        raised = swing & (old_phases < duty_factor)
+        swing_feet[raised] = feet[raised]
+        swing_start[raised] = 0
+        old_phases[raised] = duty_factor
+
+        # legs, that are put down on this tick, land where the swing has brought them,
+        # a velocity changed just before it would move the touchdown point too late.
+        # Then they are moved with the body for the time after it
+        landed = ~swing & (old_phases >= duty_factor)
+        for i in np.flatnonzero(landed).tolist():
+            feet[i] = self.body_motion(swing_feet, new_phases[i] * self.parameters.period)[i]
+
+        if np.any(swing):
+            old_along = smooth_step((old_phases[swing] - duty_factor) / (1 - duty_factor))
+            progress = (new_phases[swing] - duty_factor) / (1 - duty_factor)
+            # the rest of the way is made from where the foot is,
+            # so a new velocity changes the arc, and the foot does not jump
+            along = (smooth_step(progress) - old_along) / (1 - old_along)
+            swing_feet[swing] += (self.touchdown_feet()[swing] - swing_feet[swing]) * along[:, None]
+            feet[swing] = swing_feet[swing]
+            arc = (progress - swing_start[swing]) / (1 - swing_start[swing])
+            feet[swing, 2] += self.parameters.step_height * np.sin(np.pi * arc)
+
+        servo_angles, valid = solve_frames(feet[None], self.foot_angles(dt)[None])
+        if not valid[0]:
+            return None
+
+        self.phase = phase
+        self.feet = feet
+        self.swing_feet = swing_feet
+        self.swing_start = swing_start
+        self.standing = False
+        self.servo_angles = servo_angles[0]
+        return FenixPosition.from_servo(self.servo_angles.tolist())
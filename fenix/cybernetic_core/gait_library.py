@@ -0,0 +1,226 @@
+"""
+On-disk library of precomputed sequences for gait commands.
+Gait commands are replayed from the start position by the same state machine
+as CommandsForwarder uses, every (command, starting position) is solved once
+and saved with its servo sequence and resulting position. Transitions between gaits
+are walked from every status too.
+VirtualFenix takes sequences from the library, so a running gait does no IK.
+
+Build it ahead of time:
+    python fenix/cybernetic_core/gait_library.py [depth]
+"""
+import sys
+import os
+import io
+import pickle
+import contextlib
+import logging.config
+from typing import Dict, List, Optional, Tuple
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from cybernetic_core.geometry.angles import FenixPosition, leg_angles_results_fingerprint
+from cybernetic_core.geometry.angles_cache import config_fingerprint
+from cybernetic_core.geometry.angles_table import enable_angles_table
+from cybernetic_core.cybernetic_utils.history import SnapshotSequence, MOVE_TYPES, move_type_code
+import configs.config as cfg
+import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
+
+LIBRARY_VERSION = 2
+# commands, that are not a part of a gait, but are used between gaits
+GAIT_SINGLE_COMMANDS = [
+    'turn_left_two_legged',
+    'turn_right_two_legged',
+    'look_left',
+    'look_right',
+    'look_up',
+    'look_down',
+]
+
+
+def library_fingerprint(quantization: float) -> str:
+    """
+    Everything the sequences depend on. If any of it changes, library is rebuilt
+    """
+    return config_fingerprint({
+        'version': LIBRARY_VERSION,
+        'quantization': quantization,
+        'angles': leg_angles_results_fingerprint(),
+        'leg': cfg.leg,
+        'start': cfg.start,
+        'modes': cfg.modes,
+        'moves': cfg.moves,
+        'fenix': cfg.fenix,
+        'limits': cfg.limits,
+    })
+
+def library_file(quantization: float) -> str:
+    return os.path.join(code_config.cache_dir, f'gait_library_{library_fingerprint(quantization)}.pkl')
+
+def position_key(fenix_position: FenixPosition, quantization: float) -> Tuple[int, ...]:
+    return tuple([round(angle / quantization) for angle in fenix_position.angles])
+
+
+class GaitLibrary:
+    def __init__(self, quantization: float, entries: Dict = None):
+        """
+        quantization: grid step for kinematic angles of starting position, radians
+        entries: (command, position key) -> (move types, N x 16 servo angles, resulting angles)
+        """
+        self.quantization = quantization
+        self.entries = entries if entries is not None else {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, command: str, fenix_position: FenixPosition, sequence: SnapshotSequence, new_position: FenixPosition) -> None:
+        # move types are stored as names, codes are different in every process
+        self.entries[(command, position_key(fenix_position, self.quantization))] = (
+            [MOVE_TYPES[code] for code in sequence.move_type_codes.tolist()],
+            np.array(sequence.servo_angles),
+            new_position.angles.tolist(),
+        )
+
+    def get(self, command: str, fenix_position: FenixPosition) -> Tuple[Optional[SnapshotSequence], Optional[FenixPosition]]:
+        entry = self.entries.get((command, position_key(fenix_position, self.quantization)))
+        if entry is None:
+            return None, None
+        move_types, servo_angles, new_angles = entry
+        move_type_codes = np.array([move_type_code(move_type) for move_type in move_types], dtype=np.int16)
+        return SnapshotSequence(servo_angles, move_type_codes), FenixPosition.from_servo(new_angles)
+
+    def save(self, filename: str) -> None:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump({
+                'fingerprint': library_fingerprint(self.quantization),
+                'quantization': self.quantization,
+                'entries': self.entries,
+            }, f)
+        os.replace(tmp_filename, filename)
+
+    @classmethod
+    def load(cls, quantization: float = None, logger=None) -> Optional['GaitLibrary']:
+        """
+        Returns None if there is no library built for current config
+        """
+        if quantization is None:
+            quantization = code_config.gait_library_quantization
+        filename = library_file(quantization)
+        if not os.path.exists(filename):
+            if logger is not None:
+                logger.info(f'No gait library {filename}, sequences will be calculated')
+            return None
+        try:
+            with open(filename, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if data.get('fingerprint') != library_fingerprint(quantization):
+            return None
+
+        library = cls(quantization, data['entries'])
+        if logger is not None:
+            logger.info(f'Gait library: {len(library)} sequences loaded from {filename}')
+        return library
+
+
+def build_gait_library(depth: int, quantization: float = None, logger=None) -> GaitLibrary:
+    """
+    Walks every gait of CommandsForwarder from the start position
+    (start, next moves until the cycle closes, exit from every status)
+    and single commands. Positions, where gaits and single commands end,
+    are walked again, depth times
+    """
+    # imported here, sequence_getter loads the library itself
+    from cybernetic_core.kinematics import FenixKinematics
+    from cybernetic_core.sequence_getter import get_sequence_for_command_cached
+    from core.utils.multiphase_moves import CommandsForwarder
+
+    if quantization is None:
+        quantization = code_config.gait_library_quantization
+    library = GaitLibrary(quantization)
+    failed = set()
+
+    def solve(command: str, fenix_position: FenixPosition) -> Optional[FenixPosition]:
+        key = (command, position_key(fenix_position, quantization))
+        if key in failed:
+            return None
+        sequence, new_position = library.get(command, fenix_position)
+        if sequence is not None:
+            return new_position
+        try:
+            # kinematics prints a lot
+            with contextlib.redirect_stdout(io.StringIO()):
+                sequence, new_position = get_sequence_for_command_cached(command, fenix_position)
+        except Exception as e:
+            # not stored, at runtime it will be calculated and fail the usual way
+            if logger is not None:
+                logger.info(f'Gait library. {command} failed : {e}')
+            failed.add(key)
+            return None
+        library.add(command, fenix_position, sequence, new_position)
+        return new_position
+
+    start_position = FenixKinematics().current_position
+    rest_positions = [start_position]
+    seen = {position_key(start_position, quantization)}
+
+    def add_rest_position(fenix_position: Optional[FenixPosition]) -> None:
+        if fenix_position is None:
+            return
+        key = position_key(fenix_position, quantization)
+        if key not in seen:
+            seen.add(key)
+            next_rest_positions.append(fenix_position)
+
+    for _ in range(depth):
+        next_rest_positions: List[FenixPosition] = []
+        for rest_position in rest_positions:
+            for move, move_mapping in CommandsForwarder.moves.items():
+                status = move_mapping.start.status
+                fenix_position = solve(move_mapping.start.action, rest_position)
+                walked = set()
+                while fenix_position is not None and \
+                    (status, position_key(fenix_position, quantization)) not in walked:
+                    walked.add((status, position_key(fenix_position, quantization)))
+                    add_rest_position(solve(move_mapping.exit[status].action, fenix_position))
+                    for to_move, to_mapping in CommandsForwarder.moves.items():
+                        transition = CommandsForwarder.transitions.get((move, status, to_move))
+                        if transition is None:
+                            continue
+                        # the step into the other gait, the move after it and the exit from there
+                        transition_position = fenix_position
+                        if transition.action is not None:
+                            transition_position = solve(transition.action, fenix_position)
+                        if transition_position is not None:
+                            add_rest_position(solve(to_mapping.exit[transition.status].action, transition_position))
+                            solve(to_mapping.next[transition.status].action, transition_position)
+                    next_status = move_mapping.next[status]
+                    fenix_position = solve(next_status.action, fenix_position)
+                    status = next_status.status
+
+            for command in GAIT_SINGLE_COMMANDS:
+                add_rest_position(solve(command, rest_position))
+        rest_positions = next_rest_positions
+
+    return library
+
+
+if __name__ == '__main__':
+    setup_logging()
+    logger = logging.getLogger('main_logger')
+    depth = code_config.gait_library_depth
+    if len(sys.argv) > 1:
+        depth = int(sys.argv[1])
+    quantization = code_config.gait_library_quantization
+    # same angles as at runtime, the movement processor enables the table before loading the library
+    enable_angles_table(logger)
+    print(f'Building gait library with depth {depth}')
+    library = build_gait_library(depth, quantization, logger)
+    filename = library_file(quantization)
+    library.save(filename)
+    print(f'Gait library {filename}: {len(library)} sequences')
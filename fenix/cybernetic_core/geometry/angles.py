@@ -1,5 +1,5 @@
 import math
-from functools import lru_cache
+from array import array
 from typing import List
 
 import sys
@@ -7,10 +7,13 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from cybernetic_core.geometry.lines import Point
+from cybernetic_core.geometry.angles_cache import LegAnglesCache, config_fingerprint
+from cybernetic_core.geometry.angles_differential import solve_differential
 from cybernetic_core.cybernetic_utils.constraints import leg_angles_correct, tettas_correct
 
 import configs.config as cfg
 import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
 import logging.config
 
 class DistanceException(Exception):
@@ -22,17 +25,69 @@ class AnglesException(Exception):
 class GeometryException(Exception):
     pass
 
+# order of the angles of one leg in FenixPosition buffer, the same as servos order
+LEG_ANGLES_ORDER = ('gamma', 'beta', 'alpha', 'tetta')
+
 class FenixPositionLeg():
+    """
+    Angles of one leg. Either owns 4 floats or is a view on 4 floats of FenixPosition buffer
+    """
+    __slots__ = ('buffer', 'offset')
+
     def __init__(self, alpha, beta, gamma, tetta):
-        self.alpha = alpha
-        self.beta = beta
-        self.gamma = gamma
-        self.tetta = tetta
+        self.buffer = array('d', (gamma, beta, alpha, tetta))
+        self.offset = 0
+
+    @classmethod
+    def view(cls, buffer: array, offset: int) -> 'FenixPositionLeg':
+        leg = cls.__new__(cls)
+        leg.buffer = buffer
+        leg.offset = offset
+        return leg
+
+    @property
+    def gamma(self):
+        return self.buffer[self.offset]
+
+    @gamma.setter
+    def gamma(self, value):
+        self.buffer[self.offset] = value
+
+    @property
+    def beta(self):
+        return self.buffer[self.offset + 1]
+
+    @beta.setter
+    def beta(self, value):
+        self.buffer[self.offset + 1] = value
+
+    @property
+    def alpha(self):
+        return self.buffer[self.offset + 2]
+
+    @alpha.setter
+    def alpha(self, value):
+        self.buffer[self.offset + 2] = value
+
+    @property
+    def tetta(self):
+        return self.buffer[self.offset + 3]
+
+    @tetta.setter
+    def tetta(self, value):
+        self.buffer[self.offset + 3] = value
     
     def __repr__(self):
         return f'a: {self.alpha}, b: {self.beta}, g: {self.gamma}, t: {self.tetta}'
 
 class FenixPosition():
+    """
+    16 angles in one contiguous buffer, in servo order:
+    gamma, beta, alpha, tetta for legs 1 to 4.
+    legs[i] are views on this buffer, so changing them changes the position
+    """
+    __slots__ = ('angles', '_legs')
+
     def __init__(self, 
             leg1_tetta,
             leg1_alpha,
@@ -51,64 +106,234 @@ class FenixPosition():
             leg4_beta,
             leg4_gamma
             ):
-        leg1 = FenixPositionLeg(leg1_alpha, leg1_beta, leg1_gamma, leg1_tetta)
-        leg2 = FenixPositionLeg(leg2_alpha, leg2_beta, leg2_gamma, leg2_tetta)
-        leg3 = FenixPositionLeg(leg3_alpha, leg3_beta, leg3_gamma, leg3_tetta)
-        leg4 = FenixPositionLeg(leg4_alpha, leg4_beta, leg4_gamma, leg4_tetta)
-        self.legs = {
-            1: leg1, 2: leg2, 3: leg3, 4: leg4
-        }
-
-    def to_servo(self):
-        return [
-            self.legs[1].gamma, self.legs[1].beta, self.legs[1].alpha, self.legs[1].tetta,
-            self.legs[2].gamma, self.legs[2].beta, self.legs[2].alpha, self.legs[2].tetta,
-            self.legs[3].gamma, self.legs[3].beta, self.legs[3].alpha, self.legs[3].tetta,
-            self.legs[4].gamma, self.legs[4].beta, self.legs[4].alpha, self.legs[4].tetta,
-        ]
+        self.angles = array('d', (
+            leg1_gamma, leg1_beta, leg1_alpha, leg1_tetta,
+            leg2_gamma, leg2_beta, leg2_alpha, leg2_tetta,
+            leg3_gamma, leg3_beta, leg3_alpha, leg3_tetta,
+            leg4_gamma, leg4_beta, leg4_alpha, leg4_tetta,
+        ))
+        self._legs = None
+
+    @classmethod
+    def from_servo(cls, servo_angles) -> 'FenixPosition':
+        """
+        servo_angles: 16 angles in servo order, any iterable of floats
+        """
+        fp = cls.__new__(cls)
+        fp.angles = array('d', servo_angles)
+        if len(fp.angles) != 16:
+            raise ValueError(f'16 angles expected, got {len(fp.angles)}')
+        fp._legs = None
+        return fp
+
+    @property
+    def legs(self):
+        # views are created on first access, most positions are never read by legs
+        if self._legs is None:
+            self._legs = {
+                leg_num: FenixPositionLeg.view(self.angles, 4 * (leg_num - 1)) 
+                for leg_num in range(1, 5)
+            }
+        return self._legs
+
+    def to_servo(self) -> memoryview:
+        """
+        Read-only view on the buffer, no copying
+        """
+        return memoryview(self.angles).toreadonly()
+
+    def copy(self) -> 'FenixPosition':
+        fp = FenixPosition.__new__(FenixPosition)
+        fp.angles = self.angles[:]
+        fp._legs = None
+        return fp
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __reduce__(self):
+        return build_position_from_servos, (self.angles.tolist(),)
+
+    def __eq__(self, another) -> bool:
+        if not isinstance(another, FenixPosition):
+            return NotImplemented
+        return self.angles == another.angles
 
     def __hash__(self):
-        return hash(self.to_servo())
+        # hash of a tuple of floats does not depend on PYTHONHASHSEED
+        return hash(tuple(self.angles))
 
     def __repr__(self):
         return f'\n1: {self.legs[1]}\n2: {self.legs[2]}\n3: {self.legs[3]}\n4: {self.legs[4]}\n'
 
 def build_position_from_servos(servo_angles: List[float]) -> FenixPosition:
     # incoming angles: gamma, beta, alpha, tetta for leg 1 to 4
-    gamma1, beta1, alpha1, tetta1, gamma2, beta2, alpha2, tetta2, gamma3, beta3, alpha3, tetta3, gamma4, beta4, alpha4, tetta4 = servo_angles
-    return FenixPosition(
-        leg1_alpha=alpha1,
-        leg1_beta=beta1,
-        leg1_gamma=gamma1,
-        leg1_tetta=tetta1,
-
-        leg2_alpha=alpha2,
-        leg2_beta=beta2,
-        leg2_gamma=gamma2,
-        leg2_tetta=tetta2,
-
-        leg3_alpha=alpha3,
-        leg3_beta=beta3,
-        leg3_gamma=gamma3,
-        leg3_tetta=tetta3,
-
-        leg4_alpha=alpha4,
-        leg4_beta=beta4,
-        leg4_gamma=gamma4,
-        leg4_tetta=tetta4,
-    )
+    return FenixPosition.from_servo(servo_angles)
+
+# preferred angle of the foot (alpha + beta + gamma) to the surface, degrees
+PREFERRED_FOOT_ANGLE = -92
+# ksi is the angle of the last link (C -> D) from vertical, degrees
+KSI_RANGE = (-45, 44)
+# precomputed LegAnglesTable, see angles_table.enable_angles_table
+leg_angles_table = None
+leg_angles_cache = LegAnglesCache(
+    code_config.angles_cache_size,
+    code_config.angles_cache_quantization
+)
+
+def leg_angles_fingerprint() -> str:
+    """
+    Everything get_leg_angles result depends on
+    """
+    return config_fingerprint({
+        'leg': {key: cfg.leg[key] for key in ['a', 'b', 'c']},
+        'angles_limits': cfg.angles_limits,
+        'preferred_foot_angle': PREFERRED_FOOT_ANGLE,
+        'ksi_range': KSI_RANGE,
+    })
+
+def leg_angles_results_fingerprint() -> str:
+    """
+    leg_angles_fingerprint and the table setting, angles from the table differ from the search a little
+    """
+    table_resolution = code_config.angles_table_resolution if code_config.angles_table_enabled else None
+    return config_fingerprint({
+        'angles': leg_angles_fingerprint(),
+        'table_resolution': table_resolution,
+    })
+
+def load_leg_angles_cache(logger=None) -> int:
+    if not code_config.angles_cache_file:
+        return 0
+    loaded = leg_angles_cache.load(code_config.angles_cache_file, leg_angles_results_fingerprint())
+    if logger is not None:
+        logger.info(f'Leg angles cache: {loaded} entries loaded from {code_config.angles_cache_file}')
+    return loaded
+
+def save_leg_angles_cache(logger=None) -> None:
+    if not code_config.angles_cache_file:
+        return
+    leg_angles_cache.save(code_config.angles_cache_file, leg_angles_results_fingerprint())
+    if logger is not None:
+        logger.info(f'Leg angles cache saved: {leg_angles_cache.stats()}')
+
+def get_leg_angles(delta_x, delta_z, logger, current_angles=None):
+    """
+    current_angles: [alpha, beta, gamma] the leg has now, if known.
+    Small steps from the preferred foot angle are solved with differential IK
+    """
+    key = leg_angles_cache.key(delta_x, delta_z)
+    cached_angles = leg_angles_cache.get(key)
+    if cached_angles is not None:
+        return cached_angles
 
-@lru_cache(maxsize=None)
-def get_leg_angles(delta_x, delta_z, logger):
+    delta_x, delta_z = leg_angles_cache.point(key)
     if delta_x < 0:
         raise AnglesException(f'Negative X. DeltaX: {delta_x}. DeltaZ: {delta_z}')
-    possible_angles = find_angles(delta_x, delta_z, logger)
-    if len(possible_angles) == 0:
+    best_angles = None
+    if current_angles is not None and code_config.differential_ik_enabled and \
+        abs(math.degrees(sum(current_angles)) - PREFERRED_FOOT_ANGLE) < 1e-6:
+        best_angles = solve_differential(
+            current_angles, 
+            delta_x, 
+            delta_z, 
+            code_config.differential_ik_max_step, 
+            code_config.differential_ik_limit_margin
+        )
+    if best_angles is None and leg_angles_table is not None:
+        best_angles = leg_angles_table.lookup(delta_x, delta_z)
+    if best_angles is None:
+        best_angles = find_best_angles(delta_x, delta_z, logger)
+    if best_angles is None:
         raise AnglesException(f'No angles. DeltaX: {delta_x}. DeltaZ: {delta_z}')
-    best_angles = get_best_angles(possible_angles)
-    logger.info(f'(delta_x, delta_z): ({delta_x}, {delta_z}). Best angles: {[math.degrees(x) for x in best_angles]}')
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('(delta_x, delta_z): (%s, %s). Best angles: %s', delta_x, delta_z, [math.degrees(x) for x in best_angles])
+    leg_angles_cache.put(key, best_angles)
     return best_angles
 
+def angles_for_ksi(Dx, Dy, k, logger=None):
+    """
+    Solves the leg for a fixed angle of the last link (ksi, degrees).
+    Returns a list of [alpha, beta, gamma] that pass leg_angles_correct,
+    it is empty if D can not be reached with this ksi
+    """
+    a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
+    results = []
+
+    ksi = math.radians(k)
+
+    Cx = Dx + c * math.cos(math.pi / 2 + ksi)
+    Cy = Dy + c * math.sin(math.pi / 2 + ksi)
+    dist = math.sqrt(Cx ** 2 + Cy ** 2)
+
+    if dist > a + b or dist < abs(a - b):
+        return results
+
+    alpha1 = math.acos((a ** 2 + dist ** 2 - b ** 2) / (2 * a * dist))
+    beta1 = math.acos((a ** 2 + b ** 2 - dist ** 2) / (2 * a * b))
+    beta = -1 * (math.pi - beta1)
+
+    alpha2 = math.atan2(Cy, Cx)
+    alpha = alpha1 + alpha2
+
+    Bx = a * math.cos(alpha)
+    By = a * math.sin(alpha)
+
+    BD = math.sqrt((Dx - Bx) ** 2 + (Dy - By) ** 2)
+    angle_C = math.acos((b ** 2 + c ** 2 - BD ** 2) / (2 * b * c))
+
+    for coef in [-1, 1]:
+        gamma = coef * (math.pi - angle_C)
+
+        Cx = Bx + b * math.cos(alpha + beta)
+        Cy = By + b * math.sin(alpha + beta)
+        new_Dx = Cx + c * math.cos(alpha + beta + gamma)
+        new_Dy = Cy + c * math.sin(alpha + beta + gamma)
+        if abs(new_Dx - Dx) > 0.01 or abs(new_Dy - Dy) > 0.01:
+            # only one of two coeffs is correct
+            continue
+        if leg_angles_correct(
+            alpha=math.degrees(alpha), 
+            beta=math.degrees(beta), 
+            gamma=math.degrees(gamma),
+            logger=logger
+        ):
+            results.append([alpha, beta, gamma])
+
+    return results
+
+def find_best_angles(Dx, Dy, logger=None):
+    """
+    Closed-form solution for the preferred foot angle.
+    If it is rejected by constraints, ksi values are tried in rings around
+    the preferred one, so the result is the same as
+    get_best_angles(find_angles(Dx, Dy)), without solving the whole range.
+    Returns None if there is no solution
+    """
+    a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
+    full_dist = math.sqrt(Dx ** 2 + Dy ** 2)
+    if full_dist > a + b + c:
+        raise DistanceException('No decisions. Full distance : {0}'.format(full_dist))
+
+    preferred_ksi = PREFERRED_FOOT_ANGLE + 90
+    ksi_min, ksi_max = KSI_RANGE
+    max_offset = max(preferred_ksi - ksi_min, ksi_max - preferred_ksi)
+
+    for offset in range(max_offset + 1):
+        # same order as in find_angles, so ties are resolved the same way
+        ring = sorted(set([preferred_ksi - offset, preferred_ksi + offset]))
+        candidates = []
+        for k in ring:
+            if ksi_min <= k <= ksi_max:
+                candidates.extend(angles_for_ksi(Dx, Dy, k, logger))
+        if len(candidates) > 0:
+            return get_best_angles(candidates)
+
+    return None
+
 def find_angles(Dx, Dy, logger):
     a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
     results = []
@@ -116,55 +341,13 @@ def find_angles(Dx, Dy, logger):
     if full_dist > a + b + c:
         raise DistanceException('No decisions. Full distance : {0}'.format(full_dist))
 
-    for k in range(-45, 45, 1):
-
-        ksi = math.radians(k)
-
-        Cx = Dx + c * math.cos(math.pi / 2 + ksi)
-        Cy = Dy + c * math.sin(math.pi / 2 + ksi)
-        dist = math.sqrt(Cx ** 2 + Cy ** 2)
-
-        if dist > a + b or dist < abs(a - b):
-            #print(dist, dist > a + b, dist < abs(a - b))
-            pass
-        else:
-            alpha1 = math.acos((a ** 2 + dist ** 2 - b ** 2) / (2 * a * dist))
-            beta1 = math.acos((a ** 2 + b ** 2 - dist ** 2) / (2 * a * b))
-            beta = -1 * (math.pi - beta1)
-
-            alpha2 = math.atan2(Cy, Cx)
-            alpha = alpha1 + alpha2
-
-            Bx = a * math.cos(alpha)
-            By = a * math.sin(alpha)
-
-            BD = math.sqrt((Dx - Bx) ** 2 + (Dy - By) ** 2)
-            angle_C = math.acos((b ** 2 + c ** 2 - BD ** 2) / (2 * b * c))
-
-            for coef in [-1, 1]:
-                gamma = coef * (math.pi - angle_C)
-
-                Cx = Bx + b * math.cos(alpha + beta)
-                Cy = By + b * math.sin(alpha + beta)
-                new_Dx = Cx + c * math.cos(alpha + beta + gamma)
-                new_Dy = Cy + c * math.sin(alpha + beta + gamma)
-                if abs(new_Dx - Dx) > 0.01 or abs(new_Dy - Dy) > 0.01:
-                    
-                    continue
-                    # only one of two coeffs is correct
-                #print(f'B: {Bx, By}. C: {Cx, Cy}')
-                #print(f'alpha: {round(math.degrees(alpha), 2)}, beta: {round(math.degrees(beta), 2)}, gamma: {round(math.degrees(gamma), 2)}')
-                if leg_angles_correct(
-                    alpha=math.degrees(alpha), 
-                    beta=math.degrees(beta), 
-                    gamma=math.degrees(gamma),
-                    logger=logger
-                ):
-                    results.append([alpha, beta, gamma])
+    ksi_min, ksi_max = KSI_RANGE
+    for k in range(ksi_min, ksi_max + 1):
+        results.extend(angles_for_ksi(Dx, Dy, k, logger))
 
     return results
 
-def calculate_leg_angles(O: Point, D: Point, logger):
+def calculate_leg_angles(O: Point, D: Point, logger, current_angles=None):
     #print(f'[CLA] O: {O}, D: {D}')
     tetta = math.atan2(D.y - O.y, D.x - O.x)
     
@@ -176,7 +359,7 @@ def calculate_leg_angles(O: Point, D: Point, logger):
     delta_z = round(D.z - O.z, 2)
     #logger.info(f'[ANG] Trying l {l} and delta_z {delta_z}. O: {O}. D: {D}')
 
-    alpha, beta, gamma = get_leg_angles(l, delta_z, logger)
+    alpha, beta, gamma = get_leg_angles(l, delta_z, logger, current_angles)
 
     #logger.info(f'[ANG] Result : {[round(math.degrees(x), 2) for x in [alpha, beta, gamma, tetta]]}')
 
@@ -263,7 +446,7 @@ def get_angles_distance(angles):
           math.degrees(angles[0] + angles[1] + angles[2])
           )
     """
-    return (math.degrees(angles[0] + angles[1] + angles[2]) + 92) ** 2
+    return (math.degrees(angles[0] + angles[1] + angles[2]) - PREFERRED_FOOT_ANGLE) ** 2
 
 def convert_alpha(alpha: float) -> float:
     alpha_converted = round(math.degrees(alpha), 2)
@@ -405,35 +588,20 @@ def convert_legs_angles_C(fp_in: FenixPosition, logger=None) -> FenixPosition:
     # output: 16 converted angles in DEGREES
     # now tetta, alpha, beta one leg after another
     #print(f'Before conversion: {fp_in}')
-    fp = FenixPosition(
-        leg1_alpha=convert_alpha(fp_in.legs[1].alpha),
-        leg1_beta=convert_beta(fp_in.legs[1].beta),
-        leg1_gamma=convert_gamma(fp_in.legs[1].gamma),
-        leg1_tetta=convert_tetta(fp_in.legs[1].tetta, 1),
-
-        leg2_alpha=convert_alpha(fp_in.legs[2].alpha),
-        leg2_beta=convert_beta(fp_in.legs[2].beta),
-        leg2_gamma=convert_gamma(fp_in.legs[2].gamma),
-        leg2_tetta=convert_tetta(fp_in.legs[2].tetta, 2),
-
-        leg3_alpha=convert_alpha(fp_in.legs[3].alpha),
-        leg3_beta=convert_beta(fp_in.legs[3].beta),
-        leg3_gamma=convert_gamma(fp_in.legs[3].gamma),
-        leg3_tetta=convert_tetta(fp_in.legs[3].tetta, 3),
-
-        leg4_alpha=convert_alpha(fp_in.legs[4].alpha),
-        leg4_beta=convert_beta(fp_in.legs[4].beta),
-        leg4_gamma=convert_gamma(fp_in.legs[4].gamma),
-        leg4_tetta=convert_tetta(fp_in.legs[4].tetta, 4),
-    )    
+    angles_in = fp_in.angles
+    fp = FenixPosition.from_servo(
+        angle
+        for leg_num in range(1, 5)
+        for angle in (
+            convert_gamma(angles_in[4 * leg_num - 4]),
+            convert_beta(angles_in[4 * leg_num - 3]),
+            convert_alpha(angles_in[4 * leg_num - 2]),
+            convert_tetta(angles_in[4 * leg_num - 1], leg_num),
+        )
+    )
     #print(f'Converted: {fp}')
 
-    if not tettas_correct([
-        fp.legs[1].tetta, 
-        fp.legs[2].tetta, 
-        fp.legs[3].tetta, 
-        fp.legs[4].tetta
-        ], 
+    if not tettas_correct(fp.angles[3::4], 
         logger=logger):
         raise AnglesException('Bad tettas')
     """
@@ -508,7 +676,7 @@ def turn_on_angle(start_x, start_y, x1, y1, angle):
 
 
 if __name__ == '__main__':
-    logging.config.dictConfig(code_config.logger_config)
+    setup_logging()
     logger = logging.getLogger('main_logger')
 
     #fp = FenixPosition('physical', 44.51882068166497, 14.398429391637588, -82.79813097435527, -20.637939780612253, -26.762858610560755, 12.719663051904275, -128.64048416277242, 26.401895199628335, -135.24095796267952, 4.079459501331462, -131.7573745682841, 13.68223214772406, 114.59728860411596, 9.837685342396234, -134.63935227779214, 33.598245106471474)
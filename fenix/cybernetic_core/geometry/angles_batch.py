@@ -0,0 +1,203 @@
+"""
+Vectorized version of calculate_leg_angles.
+Takes O and D points as arrays (last axis is x, y, z) and solves all of them in one pass.
+Instead of exceptions a validity mask is returned,
+angles of invalid legs are nan.
+"""
+import sys
+import os
+from typing import Tuple
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+
+from cybernetic_core.geometry.angles import PREFERRED_FOOT_ANGLE, KSI_RANGE
+from cybernetic_core.cybernetic_utils.constraints import leg_angles_correct_batch, tettas_correct_batch
+import configs.config as cfg
+
+# same as in convert_tetta, degrees for legs 1-4
+TETTA_OFFSETS = np.array([-45.0, 45.0, 135.0, -135.0])
+
+
+def solve_ksi_batch(Dx: np.ndarray, Dy: np.ndarray, ksi_deg) -> Tuple[np.ndarray, ...]:
+    """
+    Array version of angles_for_ksi.
+    Dx, Dy and ksi_deg broadcast together, result has one more axis of size 2
+    for gamma coefs -1 and 1. Returns alpha, beta, gamma, valid
+    """
+    a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
+    ksi = np.radians(ksi_deg)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Cx = Dx + c * np.cos(np.pi / 2 + ksi)
+        Cy = Dy + c * np.sin(np.pi / 2 + ksi)
+        dist = np.sqrt(Cx ** 2 + Cy ** 2)
+        reachable = (dist <= a + b) & (dist >= abs(a - b))
+
+        alpha1 = np.arccos((a ** 2 + dist ** 2 - b ** 2) / (2 * a * dist))
+        beta1 = np.arccos((a ** 2 + b ** 2 - dist ** 2) / (2 * a * b))
+        beta = -1 * (np.pi - beta1)
+
+        alpha2 = np.arctan2(Cy, Cx)
+        alpha = alpha1 + alpha2
+
+        Bx = a * np.cos(alpha)
+        By = a * np.sin(alpha)
+
+        BD = np.sqrt((Dx - Bx) ** 2 + (Dy - By) ** 2)
+        angle_C = np.arccos((b ** 2 + c ** 2 - BD ** 2) / (2 * b * c))
+
+        coefs = np.array([-1.0, 1.0])
+        gamma = coefs * (np.pi - angle_C)[..., None]
+        alpha = np.broadcast_to(alpha[..., None], gamma.shape)
+        beta = np.broadcast_to(beta[..., None], gamma.shape)
+
+        Cx = Bx[..., None] + b * np.cos(alpha + beta)
+        Cy = By[..., None] + b * np.sin(alpha + beta)
+        new_Dx = Cx + c * np.cos(alpha + beta + gamma)
+        new_Dy = Cy + c * np.sin(alpha + beta + gamma)
+
+        valid = reachable[..., None] & \
+            (np.abs(new_Dx - Dx[..., None]) <= 0.01) & \
+            (np.abs(new_Dy - Dy[..., None]) <= 0.01) & \
+            leg_angles_correct_batch(np.degrees(alpha), np.degrees(beta), np.degrees(gamma))
+
+    return alpha, beta, gamma, valid
+
+def find_best_angles_batch(Dx: np.ndarray, Dy: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Array version of find_best_angles. Returns alpha, beta, gamma, valid
+    with the shape of Dx. The whole ksi range is solved only for the targets,
+    where the preferred foot angle is rejected
+    """
+    Dx = np.asarray(Dx, dtype=float)
+    Dy = np.asarray(Dy, dtype=float)
+    a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
+
+    alpha = np.full(Dx.shape, np.nan)
+    beta = np.full(Dx.shape, np.nan)
+    gamma = np.full(Dx.shape, np.nan)
+
+    in_range = (np.sqrt(Dx ** 2 + Dy ** 2) <= a + b + c) & (Dx >= 0)
+
+    preferred_ksi = PREFERRED_FOOT_ANGLE + 90
+    p_alpha, p_beta, p_gamma, p_valid = solve_ksi_batch(Dx, Dy, preferred_ksi)
+    # get_best_angles takes the last of equal candidates, that is coef 1
+    use_coef = np.where(p_valid[..., 1], 1, 0)
+    found = in_range & np.any(p_valid, axis=-1)
+    alpha[found] = np.take_along_axis(p_alpha, use_coef[..., None], -1)[..., 0][found]
+    beta[found] = np.take_along_axis(p_beta, use_coef[..., None], -1)[..., 0][found]
+    gamma[found] = np.take_along_axis(p_gamma, use_coef[..., None], -1)[..., 0][found]
+
+    rest = in_range & ~found
+    if np.any(rest):
+        ksi_min, ksi_max = KSI_RANGE
+        ks = np.arange(ksi_min, ksi_max + 1)
+        r_alpha, r_beta, r_gamma, r_valid = solve_ksi_batch(Dx[rest][:, None], Dy[rest][:, None], ks)
+        # candidates in the order of find_angles: ksi ascending, then gamma coef
+        r_alpha = r_alpha.reshape(len(r_alpha), -1)
+        r_beta = r_beta.reshape(len(r_beta), -1)
+        r_gamma = r_gamma.reshape(len(r_gamma), -1)
+        r_valid = r_valid.reshape(len(r_valid), -1)
+
+        # first ring around preferred ksi with a valid candidate,
+        # inside the ring the closest to preferred foot angle, last on ties
+        offsets = np.repeat(np.abs(ks - preferred_ksi), 2)
+        ring = np.min(np.where(r_valid, offsets, np.iinfo(int).max), axis=1)
+        in_ring = r_valid & (offsets == ring[:, None])
+        with np.errstate(invalid='ignore'):
+            distance = np.where(
+                in_ring,
+                (np.degrees(r_alpha + r_beta + r_gamma) - PREFERRED_FOOT_ANGLE) ** 2,
+                np.inf
+            )
+        idx = distance.shape[1] - 1 - np.argmin(distance[:, ::-1], axis=1)
+        r_found = np.any(r_valid, axis=1)
+        rows = np.arange(len(idx))
+
+        rest_idx = np.nonzero(rest)
+        found_idx = tuple(x[r_found] for x in rest_idx)
+        alpha[found_idx] = r_alpha[rows, idx][r_found]
+        beta[found_idx] = r_beta[rows, idx][r_found]
+        gamma[found_idx] = r_gamma[rows, idx][r_found]
+        found[found_idx] = True
+
+    return alpha, beta, gamma, found
+
+def calculate_D_points_batch(O: np.ndarray, tetta, alpha, beta, gamma) -> np.ndarray:
+    """
+    Array version of calculate_D_point without the D check, rounded the same way
+    """
+    O = np.asarray(O, dtype=float)
+    a, b, c, d = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"], cfg.leg["d"]
+    D_x = a * np.cos(alpha) + b * np.cos(alpha + beta) + c * np.cos(alpha + beta + gamma)
+    D_z = a * np.sin(alpha) + b * np.sin(alpha + beta) + c * np.sin(alpha + beta + gamma)
+    return np.round(np.stack([
+        O[..., 0] + (d + D_x) * np.cos(tetta),
+        O[..., 1] + (d + D_x) * np.sin(tetta),
+        O[..., 2] + D_z
+    ], axis=-1), 2)
+
+def calculate_leg_angles_batch(O: np.ndarray, D: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Array version of calculate_leg_angles.
+    O and D have shape (..., 3). Returns tetta, alpha, beta, gamma (radians) and valid,
+    each with shape (...)
+    """
+    O = np.asarray(O, dtype=float)
+    D = np.asarray(D, dtype=float)
+    d = cfg.leg["d"]
+
+    tetta = np.arctan2(D[..., 1] - O[..., 1], D[..., 0] - O[..., 0])
+    A_x = O[..., 0] + d * np.cos(tetta)
+    A_y = O[..., 1] + d * np.sin(tetta)
+    l = np.round(np.sqrt((D[..., 0] - A_x) ** 2 + (D[..., 1] - A_y) ** 2), 2)
+    delta_z = np.round(D[..., 2] - O[..., 2], 2)
+
+    alpha, beta, gamma, valid = find_best_angles_batch(l, delta_z)
+    # calculate_leg_angles checks tetta with kinematic angles, here it is the same
+    with np.errstate(invalid='ignore'):
+        valid &= leg_angles_correct_batch(alpha, beta, gamma, tetta)
+
+        # D check, as in calculate_leg_angles, including mirrored A
+        a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
+        D_calculated = calculate_D_points_batch(O, tetta, alpha, beta, gamma)
+        D_x = a * np.cos(alpha) + b * np.cos(alpha + beta) + c * np.cos(alpha + beta + gamma)
+        D_mirrored = D_calculated.copy()
+        D_mirrored[..., 0] = np.round(A_x - D_x * np.cos(tetta), 2)
+        D_mirrored[..., 1] = np.round(A_y - D_x * np.sin(tetta), 2)
+        close = np.all(np.abs(D_calculated - D) <= 0.01, axis=-1) | \
+            np.all(np.abs(D_mirrored - D) <= 0.01, axis=-1)
+    valid &= close
+
+    tetta = np.where(valid, tetta, np.nan)
+    return tetta, alpha, beta, gamma, valid
+
+def convert_legs_angles_batch(tetta, alpha, beta, gamma) -> np.ndarray:
+    """
+    Array version of convert_legs_angles_C.
+    Input arrays have shape (N, 4), radians.
+    Output has shape (N, 16), degrees, in servo order (gamma, beta, alpha, tetta for legs 1-4)
+    """
+    servo = np.stack([
+        -np.round(np.degrees(gamma), 2),
+        -np.round(np.degrees(beta) + 90, 2),
+        np.round(np.degrees(alpha), 2),
+        np.round(np.degrees(tetta) + TETTA_OFFSETS, 2),
+    ], axis=-1)
+    return servo.reshape(servo.shape[:-2] + (16,))
+
+def calculate_legs_angles_batch(O: np.ndarray, D: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Solves whole sequences at once.
+    O and D have shape (N, 4, 3) - N snapshots of 4 legs.
+    Returns tetta, alpha, beta, gamma with shape (N, 4), radians,
+    and valid with shape (N, 4). A snapshot with bad tettas
+    (as in convert_legs_angles_C) is invalid for all of its legs
+    """
+    tetta, alpha, beta, gamma, valid = calculate_leg_angles_batch(O, D)
+    with np.errstate(invalid='ignore'):
+        tettas_ok = tettas_correct_batch(np.round(np.degrees(tetta) + TETTA_OFFSETS, 2))
+    valid &= tettas_ok[..., None]
+
+    return tetta, alpha, beta, gamma, valid
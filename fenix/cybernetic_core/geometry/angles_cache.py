@@ -0,0 +1,106 @@
+"""
+Bounded LRU cache for get_leg_angles.
+Keys are (delta_x, delta_z) quantized to integers, so logger and float noise do not matter.
+Counts hits, misses and evictions, can be saved to disk and warm-loaded at startup.
+"""
+import os
+import json
+import pickle
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def config_fingerprint(params: Dict) -> str:
+    return hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class LegAnglesCache:
+    def __init__(self, maxsize: int, quantization: float):
+        """
+        maxsize: max number of entries, 0 disables the cache
+        quantization: grid step for delta_x and delta_z, cm
+        """
+        self.maxsize = maxsize
+        self.quantization = quantization
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, delta_x: float, delta_z: float) -> Tuple[int, int]:
+        return round(delta_x / self.quantization), round(delta_z / self.quantization)
+
+    def point(self, key: Tuple[int, int]) -> Tuple[float, float]:
+        """
+        (delta_x, delta_z) the key stands for, angles are calculated for this point
+        """
+        return round(key[0] * self.quantization, 4), round(key[1] * self.quantization, 4)
+
+    def get(self, key: Tuple[int, int]) -> Optional[List[float]]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Tuple[int, int], value: List[float]) -> None:
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict:
+        requests = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / requests, 3) if requests > 0 else 0,
+        }
+
+    def save(self, filename: str, fingerprint: str) -> None:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump({
+                'fingerprint': fingerprint,
+                'quantization': self.quantization,
+                'entries': list(self.entries.items()),
+            }, f)
+        os.replace(tmp_filename, filename)
+
+    def load(self, filename: str, fingerprint: str) -> int:
+        """
+        Warm-loads entries saved with the same fingerprint and quantization.
+        Returns the number of entries loaded
+        """
+        if not os.path.exists(filename):
+            return 0
+        try:
+            with open(filename, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return 0
+        if data.get('fingerprint') != fingerprint or \
+            data.get('quantization') != self.quantization:
+            return 0
+
+        if self.maxsize <= 0:
+            return 0
+        # most recently used entries are the last ones, keep them if maxsize is smaller
+        entries = data['entries'][-self.maxsize:]
+        for key, value in entries:
+            self.put(key, value)
+        return len(entries)
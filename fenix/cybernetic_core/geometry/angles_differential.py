@@ -0,0 +1,85 @@
+"""
+Differential IK for small steps of a foot.
+Starting from current angles, (l, delta_z) is reached with Newton steps
+on the analytic leg Jacobian, while the foot angle (alpha + beta + gamma) is kept.
+Used only when current foot angle is the preferred one, then the result is
+the same, that the full search gives. Big steps and results near joint limits
+are left to the full search.
+"""
+import math
+from typing import List, Optional, Tuple
+
+import configs.config as cfg
+
+MAX_ITERATIONS = 5
+# (l, delta_z) error to stop iterating, cm
+PRECISION = 1e-9
+# determinant below this means a stretched or folded leg, Jacobian is not reliable
+MIN_DETERMINANT = 1e-6
+
+
+def leg_jacobian(alpha: float, beta: float) -> Tuple[float, float, float, float]:
+    """
+    d(l, delta_z) / d(alpha, beta) with the foot angle fixed (d_gamma = -d_alpha - d_beta).
+    The last link only moves in parallel then, so it is the Jacobian of the first two links.
+    Returns (dl/d_alpha, dl/d_beta, dz/d_alpha, dz/d_beta)
+    """
+    a, b = cfg.leg["a"], cfg.leg["b"]
+    s1, c1 = a * math.sin(alpha), a * math.cos(alpha)
+    s2, c2 = b * math.sin(alpha + beta), b * math.cos(alpha + beta)
+    return -s1 - s2, -s2, c1 + c2, c2
+
+def near_limits(alpha: float, beta: float, gamma: float, margin: float) -> bool:
+    """
+    margin: degrees from angles_limits, that are considered near
+    """
+    limits = cfg.angles_limits
+    margin = math.radians(margin)
+    for name, value in (('alpha', alpha), ('beta', beta), ('gamma', gamma)):
+        if value < math.radians(limits[name]["min"]) + margin or \
+            value > math.radians(limits[name]["max"]) - margin:
+            return True
+    return False
+
+def solve_differential(
+        current_angles: Tuple[float, float, float],
+        delta_x: float,
+        delta_z: float,
+        max_step: float,
+        margin: float
+    ) -> Optional[List[float]]:
+    """
+    Returns [alpha, beta, gamma] for (delta_x, delta_z) near current angles
+    or None, if the full search has to be used
+    """
+    a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
+    alpha, beta, gamma = current_angles
+    foot_angle = alpha + beta + gamma
+    # with the foot angle fixed the last link is a constant offset,
+    # so only point C (end of the first two links) is moved
+    target_l = delta_x - c * math.cos(foot_angle)
+    target_z = delta_z - c * math.sin(foot_angle)
+
+    for iteration in range(MAX_ITERATIONS + 1):
+        # leg_jacobian inlined, sines and cosines are shared with forward kinematics
+        s1, c1 = a * math.sin(alpha), a * math.cos(alpha)
+        s2, c2 = b * math.sin(alpha + beta), b * math.cos(alpha + beta)
+        error_l, error_z = target_l - c1 - c2, target_z - s1 - s2
+        if iteration == 0 and math.hypot(error_l, error_z) > max_step:
+            return None
+        if abs(error_l) < PRECISION and abs(error_z) < PRECISION:
+            break
+        dl_da, dl_db, dz_da, dz_db = -s1 - s2, -s2, c1 + c2, c2
+        determinant = dl_da * dz_db - dl_db * dz_da
+        if abs(determinant) < MIN_DETERMINANT:
+            return None
+        alpha += (dz_db * error_l - dl_db * error_z) / determinant
+        beta += (dl_da * error_z - dz_da * error_l) / determinant
+    else:
+        # did not converge
+        return None
+
+    gamma = foot_angle - alpha - beta
+    if near_limits(alpha, beta, gamma, margin):
+        return None
+    return [alpha, beta, gamma]
@@ -0,0 +1,157 @@
+"""
+Precomputed table of leg angles over (l, delta_z) workspace.
+get_leg_angles depends only on two rounded numbers, so the whole domain is solved
+once with the batch solver, saved to .npy in cache dir and memory-mapped at startup.
+Lookups use bilinear interpolation, exact solver is used near constraint borders.
+
+Build it ahead of time:
+    python fenix/cybernetic_core/geometry/angles_table.py
+"""
+import sys
+import os
+import math
+import logging.config
+from typing import List, Optional
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+
+from cybernetic_core.geometry import angles
+from cybernetic_core.geometry.angles_batch import find_best_angles_batch
+from cybernetic_core.geometry.angles_cache import config_fingerprint
+from cybernetic_core.cybernetic_utils.constraints import leg_angles_correct
+import configs.config as cfg
+import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
+
+TABLE_VERSION = 1
+# interpolated angles have to reproduce (l, delta_z) with this precision, cm
+LOOKUP_TOLERANCE = 0.001
+
+
+def table_fingerprint(resolution: float) -> str:
+    """
+    Everything the table depends on. If any of it changes, table is rebuilt
+    """
+    return config_fingerprint({
+        'version': TABLE_VERSION,
+        'resolution': resolution,
+        'angles': angles.leg_angles_fingerprint(),
+    })
+
+def table_file(resolution: float) -> str:
+    return os.path.join(code_config.cache_dir, f'leg_angles_{table_fingerprint(resolution)}.npy')
+
+def table_bounds():
+    reach = math.ceil(cfg.leg["a"] + cfg.leg["b"] + cfg.leg["c"])
+    return 0, reach, -reach, reach
+
+def build_table(resolution: float) -> np.ndarray:
+    """
+    Returns array of shape (n_l, n_z, 4): alpha, beta, gamma, foot angle.
+    Foot angle is in whole degrees (it is set by ksi), nan if there is no solution
+    """
+    l_min, l_max, z_min, z_max = table_bounds()
+    ls = np.round(np.arange(l_min, l_max + resolution / 2, resolution), 4)
+    zs = np.round(np.arange(z_min, z_max + resolution / 2, resolution), 4)
+
+    table = np.full((len(ls), len(zs), 4), np.nan)
+    # row by row, to keep memory low on the Pi
+    for i, l in enumerate(ls):
+        dx = np.full(zs.shape, l)
+        alpha, beta, gamma, valid = find_best_angles_batch(dx, zs)
+        table[i, :, 0] = alpha
+        table[i, :, 1] = beta
+        table[i, :, 2] = gamma
+        table[i, :, 3] = np.where(valid, np.round(np.degrees(alpha + beta + gamma)), np.nan)
+
+    return table
+
+
+class LegAnglesTable:
+    def __init__(self, table: np.ndarray, resolution: float):
+        # plain ndarray view of the memmap, slicing np.memmap is several times slower
+        self.table = table.view(np.ndarray)
+        self.resolution = resolution
+        self.l_min, _, self.z_min, _ = table_bounds()
+        self.n_l, self.n_z = table.shape[:2]
+
+    @classmethod
+    def load(cls, resolution: float = None, logger=None) -> 'LegAnglesTable':
+        """
+        Memory-maps the table, builds and saves it first if there is none for current config
+        """
+        if resolution is None:
+            resolution = code_config.angles_table_resolution
+        filename = table_file(resolution)
+        if not os.path.exists(filename):
+            if logger is not None:
+                logger.info(f'Building leg angles table {filename}')
+            table = build_table(resolution)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            tmp_filename = filename + '.tmp.npy'
+            np.save(tmp_filename, table)
+            os.replace(tmp_filename, filename)
+
+        return cls(np.load(filename, mmap_mode='r'), resolution)
+
+    def lookup(self, delta_x: float, delta_z: float) -> Optional[List[float]]:
+        """
+        Returns [alpha, beta, gamma] or None, if exact solver has to be used
+        """
+        i_float = (delta_x - self.l_min) / self.resolution
+        j_float = (delta_z - self.z_min) / self.resolution
+        i, j = int(i_float), int(j_float)
+        if i < 0 or j < 0 or i + 1 >= self.n_l or j + 1 >= self.n_z:
+            return None
+
+        cell = self.table[i:i+2, j:j+2].tolist()
+        (c00, c01), (c10, c11) = cell
+        # all corners have to be solved with the same foot angle,
+        # otherwise the cell is near a constraint border (nan never equals)
+        if not (c00[3] == c01[3] == c10[3] == c11[3]):
+            return None
+
+        u, v = i_float - i, j_float - j
+        result = [
+            (1 - u) * (1 - v) * c00[k] + (1 - u) * v * c01[k] + u * (1 - v) * c10[k] + u * v * c11[k]
+            for k in range(3)
+        ]
+        alpha, beta, gamma = result
+
+        if not leg_angles_correct(
+            alpha=math.degrees(alpha),
+            beta=math.degrees(beta),
+            gamma=math.degrees(gamma)
+        ):
+            return None
+
+        a, b, c = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"]
+        l_calculated = a * math.cos(alpha) + b * math.cos(alpha + beta) + c * math.cos(alpha + beta + gamma)
+        z_calculated = a * math.sin(alpha) + b * math.sin(alpha + beta) + c * math.sin(alpha + beta + gamma)
+        if abs(l_calculated - delta_x) > LOOKUP_TOLERANCE or abs(z_calculated - delta_z) > LOOKUP_TOLERANCE:
+            return None
+
+        return result
+
+
+def enable_angles_table(logger=None) -> Optional[LegAnglesTable]:
+    """
+    Loads the table and makes get_leg_angles use it. Does nothing if disabled in code_config
+    """
+    if not code_config.angles_table_enabled:
+        return None
+    if angles.leg_angles_table is None:
+        angles.leg_angles_table = LegAnglesTable.load(logger=logger)
+    return angles.leg_angles_table
+
+
+if __name__ == '__main__':
+    setup_logging()
+    logger = logging.getLogger('main_logger')
+    resolution = code_config.angles_table_resolution
+    if len(sys.argv) > 1:
+        resolution = float(sys.argv[1])
+    print(f'Building leg angles table with resolution {resolution} cm')
+    table = LegAnglesTable.load(resolution, logger)
+    print(f'Table {table_file(resolution)}: {table.n_l} x {table.n_z}')
@@ -4,11 +4,24 @@ from __future__ import annotations
 import math
 from typing import List, Tuple
 
+import numpy as np
+
 
 class Point:
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x: float, y: float, z: float):
         self.x, self.y, self.z = x, y, z
 
+    def copy(self) -> Point:
+        return Point(self.x, self.y, self.z)
+
+    def __copy__(self) -> Point:
+        return Point(self.x, self.y, self.z)
+
+    def __deepcopy__(self, memo) -> Point:
+        return Point(self.x, self.y, self.z)
+
     def move(self, 
             delta_x: float = 0, 
             delta_y: float = 0,
@@ -196,13 +209,19 @@ class Line3D:
             return None
         return Point(x, y, z)
 
-def convert_points_to_3d_lines(D_points_history: List[List[Point]]) -> List[Line3D]:
+def convert_points_to_3d_lines(D_points_history) -> List[Line3D]:
+    """
+    D_points_history: N x 4 x 3 array (FenixKinematics.D_points_history) or lists of 4 Points
+    """
+    if not isinstance(D_points_history, np.ndarray):
+        D_points_history = np.array(
+            [[(point.x, point.y, point.z) for point in points] for points in D_points_history]
+        ).reshape(-1, 4, 3)
+    # same precision as Point.__eq__
+    moved = np.any(np.abs(np.diff(D_points_history, axis=0)) >= 0.01, axis=-1)
     lines = []
-    for i in range(len(D_points_history) - 1):
-        for j in range(4):
-            if D_points_history[i][j] == D_points_history[i+1][j]:
-                continue
-            lines.append(Line3D(D_points_history[i][j], D_points_history[i+1][j]))
+    for i, j in zip(*np.nonzero(moved)):
+        lines.append(Line3D(Point(*D_points_history[i][j].tolist()), Point(*D_points_history[i+1][j].tolist())))
 
     return lines
 
@@ -0,0 +1,125 @@
+"""
+Reachability map of a leg: is a foot target feasible and how close it is to joint limits.
+Built from the precomputed leg angles table, so a check is a few array reads
+instead of the IK search with an exception at the end.
+
+Feasibility of one leg depends only on (l, delta_z): calculate_leg_angles passes
+kinematic angles to leg_angles_correct, so its tetta rule never rejects anything.
+Tetta matters for the whole snapshot (tettas_correct on neighbouring legs),
+that is checked by tettas_reachable.
+"""
+import sys
+import os
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+
+from cybernetic_core.geometry.lines import Point
+from cybernetic_core.geometry.angles_table import LegAnglesTable
+from cybernetic_core.geometry.angles_batch import TETTA_OFFSETS
+from cybernetic_core.cybernetic_utils.constraints import joint_margins_batch, leg_angles_correct_batch
+import configs.config as cfg
+import configs.code_config as code_config
+
+
+@dataclass
+class Reachability:
+    # False only when the target is out of reach for sure,
+    # near the border of the workspace it is True and margin is 0
+    reachable: bool
+    # degrees to the closest joint limit, 0 if unknown
+    margin: float
+
+
+def joint_margins(table: np.ndarray) -> np.ndarray:
+    """
+    Degrees from alpha, beta, gamma to the closest of angles_limits, nan where there is no solution
+    """
+    alpha, beta, gamma = np.degrees(table[..., 0]), np.degrees(table[..., 1]), np.degrees(table[..., 2])
+    return joint_margins_batch(alpha, beta, gamma)
+
+
+# cell states, a cell is a square between 4 table points
+CELL_UNREACHABLE = 0
+CELL_BORDER = 1
+CELL_REACHABLE = 2
+
+
+class ReachabilityMap:
+    def __init__(self, angles_table: LegAnglesTable):
+        self.resolution = angles_table.resolution
+        self.l_min, self.z_min = angles_table.l_min, angles_table.z_min
+        self.n_l, self.n_z = angles_table.n_l, angles_table.n_z
+
+        # table points with a solution have a foot angle, it is nan otherwise
+        feasible = ~np.isnan(angles_table.table[..., 3])
+        # same constraints as the solver, in case the table was built with other limits
+        feasible &= leg_angles_correct_batch(*np.degrees(np.moveaxis(angles_table.table[..., :3], -1, 0)))
+        margin = np.where(feasible, joint_margins(angles_table.table), np.inf)
+        corners_feasible = feasible[:-1, :-1].astype(int) + feasible[1:, :-1] + feasible[:-1, 1:] + feasible[1:, 1:]
+        self.cells = np.full(corners_feasible.shape, CELL_BORDER, dtype=np.int8)
+        self.cells[corners_feasible == 0] = CELL_UNREACHABLE
+        self.cells[corners_feasible == 4] = CELL_REACHABLE
+        corners_margin = np.minimum.reduce([margin[:-1, :-1], margin[1:, :-1], margin[:-1, 1:], margin[1:, 1:]])
+        self.cells_margin = np.where(self.cells == CELL_REACHABLE, corners_margin, 0).astype(np.float32)
+
+    def check(self, tetta: float, l: float, delta_z: float) -> Reachability:
+        """
+        tetta is not used for one leg, see module docstring
+        """
+        i = math.floor((l - self.l_min) / self.resolution)
+        j = math.floor((delta_z - self.z_min) / self.resolution)
+        if i < 0 or j < 0 or i >= self.n_l - 1 or j >= self.n_z - 1:
+            # the table covers the whole reach of the leg
+            return Reachability(False, 0.0)
+
+        cell = int(self.cells[i, j])
+        if cell == CELL_UNREACHABLE:
+            return Reachability(False, 0.0)
+        if cell == CELL_BORDER:
+            return Reachability(True, 0.0)
+        return Reachability(True, float(self.cells_margin[i, j]))
+
+    def check_point(self, O: Point, D: Point) -> Reachability:
+        """
+        Same tetta, l and delta_z, that calculate_leg_angles solves
+        """
+        tetta = math.atan2(D.y - O.y, D.x - O.x)
+        A_x = O.x + cfg.leg["d"] * math.cos(tetta)
+        A_y = O.y + cfg.leg["d"] * math.sin(tetta)
+        l = round(math.sqrt((D.x - A_x) ** 2 + (D.y - A_y) ** 2), 2)
+        delta_z = round(D.z - O.z, 2)
+        return self.check(tetta, l, delta_z)
+
+
+def tettas_reachable(tettas: List[float]) -> bool:
+    """
+    tettas: kinematic tettas of legs 1 to 4, radians.
+    Same rule as tettas_correct in convert_legs_angles_C, without logging
+    """
+    servo_tettas = [round(math.degrees(tetta) + offset, 2) for tetta, offset in zip(tettas, TETTA_OFFSETS.tolist())]
+    for i in range(4):
+        if servo_tettas[i] - servo_tettas[(i + 1) % 4] > 115:
+            return False
+    return True
+
+
+# loaded by enable_reachability_map
+reachability_map: Optional[ReachabilityMap] = None
+
+def enable_reachability_map(logger=None) -> Optional[ReachabilityMap]:
+    """
+    Loads the map from the leg angles table (builds the table if there is none).
+    Does nothing if disabled in code_config
+    """
+    global reachability_map
+    if not code_config.reachability_map_enabled:
+        return None
+    if reachability_map is None:
+        reachability_map = ReachabilityMap(LegAnglesTable.load(logger=logger))
+        if logger is not None:
+            logger.info(f'Reachability map: {reachability_map.n_l} x {reachability_map.n_z}')
+    return reachability_map
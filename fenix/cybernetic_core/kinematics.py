@@ -1,16 +1,24 @@
-import math
 import copy
+import math
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from configs import config as cfg
-from cybernetic_core.geometry.angles import FenixPosition, calculate_leg_angles, turn_on_angle, convert_legs_angles_C, calculate_D_point, convert_legs_angles_to_kinematic
+from cybernetic_core.geometry.angles import AnglesException, DistanceException, FenixPosition, calculate_leg_angles, turn_on_angle, convert_legs_angles_C, calculate_D_point, convert_legs_angles_to_kinematic
 from cybernetic_core.geometry.lines import Point, LinearFunc, calculate_intersection, move_on_a_line
+from cybernetic_core.geometry import reachability
+from cybernetic_core.geometry.reachability import Reachability, enable_reachability_map, tettas_reachable
 import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
 import logging.config
 from cybernetic_core.cybernetic_utils.moves import Move, MoveSnapshot
+from cybernetic_core.cybernetic_utils.history import SnapshotHistory
+from cybernetic_core.cybernetic_utils.constraints import leg_angles_violations_batch, tettas_violations_batch, describe_violations
+from cybernetic_core.geometry.angles_batch import TETTA_OFFSETS, solve_ksi_batch
+from cybernetic_core.geometry.angles import PREFERRED_FOOT_ANGLE
 
 
 def get_turn_coords(between_legs, angle, x0=0, y0=0, x_delta=0, y_delta=0):
@@ -74,18 +82,35 @@ def move_robot_legs(leg1_x, leg1_y, leg2_x, leg2_y, leg3_x, leg3_y, leg4_x, leg4
 
 class Leg:
     def __init__(self, O: Point, D: Point):
-        logging.config.dictConfig(code_config.logger_config)
+        setup_logging()
         self.logger = logging.getLogger('angles_logger') #logging.getLogger('main_logger')
         self.O = O
         self.D = D
         #print(f'O: {O}. D: {D}')
         self.update_angles()
 
+    @classmethod
+    def restore(cls, O: Point, D: Point, angles: Tuple[float, float, float, float]) -> 'Leg':
+        """
+        Leg with already known angles (tetta, alpha, beta, gamma), without IK
+        and without logging configuration
+        """
+        leg = cls.__new__(cls)
+        leg.logger = logging.getLogger('angles_logger')
+        leg.O = O
+        leg.D = D
+        leg.tetta, leg.alpha, leg.beta, leg.gamma = angles
+        return leg
+
     def update_angles(self):
         # tetta is not fully correct, because it uses atan2
         # tetta is corrected via convert_tetta function
         #print(self.O, self.D)
-        calculated_angles = calculate_leg_angles(self.O, self.D, self.logger)
+        # angles the leg had before the move, None when the leg is created
+        current_angles = None
+        if hasattr(self, 'alpha'):
+            current_angles = (self.alpha, self.beta, self.gamma)
+        calculated_angles = calculate_leg_angles(self.O, self.D, self.logger, current_angles)
         self.tetta, self.alpha, self.beta, self.gamma = calculated_angles
         #print(f'Best angles: {round(math.degrees(self.alpha), 2), round(math.degrees(self.beta), 2), round(math.degrees(self.gamma), 2)}')
 
@@ -98,6 +123,71 @@ class Leg:
         #print(f'D Move: {delta_x, delta_y, delta_z}')
         self.update_angles()
 
+@dataclass
+class KinematicsState:
+    """
+    Everything needed to restore FenixKinematics without IK
+    """
+    # for legs 1 to 4: O (x, y, z), D (x, y, z), angles (tetta, alpha, beta, gamma)
+    legs: Tuple
+    legs_offset_v: float
+    legs_offset_h_x: float
+    legs_offset_h_y: float
+    # body attributes of a running model, defaults if None
+    body: Optional[Dict] = None
+
+@dataclass
+class BodyPoseInfeasibility:
+    """
+    Why set_body_pose could not reach the pose, nothing was moved
+    """
+    # x, y, z, roll, pitch, yaw
+    pose: Tuple[float, ...]
+    # leg number -> reason, for legs without a solution
+    legs: Dict[int, str]
+    # legs, which tetta is more than 115 degrees ahead of the next leg
+    tettas: List[int]
+
+    def __str__(self):
+        reasons = [f'leg {leg_num}: {reason}' for leg_num, reason in self.legs.items()]
+        if self.tettas:
+            reasons.append(f'bad tettas for legs {self.tettas}')
+        return f'Body pose {self.pose} is not reachable. ' + '; '.join(reasons)
+
+def body_rotation_matrix(roll: float, pitch: float, yaw: float) -> np.ndarray:
+    """
+    Rotation around x (roll), then y (pitch), then z (yaw), degrees
+    """
+    roll, pitch, yaw = math.radians(roll), math.radians(pitch), math.radians(yaw)
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return np.array([
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+        [-sp, cp * sr, cp * cr]
+    ])
+
+# attributes set by init_body_state and changed by moves
+BODY_STATE_ATTRIBUTES = [
+    'current_legs_offset_v',
+    'current_legs_offset_h_x',
+    'current_legs_offset_h_y',
+    'legs_deltas',
+    'current_angle',
+    'side_look_angle',
+    'current_vertical_angle',
+    'current_horizontal_angle',
+    'current_body_delta',
+    'body_pose',
+    'margin',
+    'leg_up',
+    'leg_up_single',
+]
+
+# position angles -> KinematicsState of a model built from it, see FenixKinematics.from_position
+kinematics_states = OrderedDict()
+
 class FenixKinematics:
     """
     Either take initial position from config
@@ -105,7 +195,7 @@ class FenixKinematics:
     or provide exact angles to create a kinematic model
     """
     def __init__(self, fenix_position: FenixPosition = None, init_snapshot=True):
-        logging.config.dictConfig(code_config.logger_config)
+        setup_logging()
         self.logger = logging.getLogger('main_logger')
 
         if fenix_position is None:
@@ -127,6 +217,13 @@ class FenixKinematics:
         #    h_y = {self.legs_offset_h_y}
         #    """)
 
+        self.init_body_state()
+        
+        self.history = SnapshotHistory()
+        if init_snapshot:
+            self.add_angles_snapshot('init')
+
+    def init_body_state(self):
         self.current_legs_offset_v = self.legs_offset_v
         self.current_legs_offset_h_x = self.legs_offset_h_x
         self.current_legs_offset_h_y = self.legs_offset_h_y
@@ -138,59 +235,174 @@ class FenixKinematics:
         self.current_vertical_angle = 0
         self.current_horizontal_angle = 0
         self.current_body_delta = [0, 0, 0]
+        # x, y, z, roll, pitch, yaw set by set_body_pose
+        self.body_pose = [0, 0, 0, 0, 0, 0]
         self.margin = cfg.fenix["margin"][1]
         self.leg_up = cfg.fenix["leg_up"][2]
         self.leg_up_single = cfg.fenix["leg_up"][1]
-        
-        self.angles_history = []
-        self.D_points_history = []
+
+    def get_state(self, with_body: bool = True) -> KinematicsState:
+        body = None
+        if with_body:
+            body = {name: copy.deepcopy(getattr(self, name)) for name in BODY_STATE_ATTRIBUTES}
+        return KinematicsState(
+            legs=tuple(
+                (
+                    (leg.O.x, leg.O.y, leg.O.z), 
+                    (leg.D.x, leg.D.y, leg.D.z), 
+                    (leg.tetta, leg.alpha, leg.beta, leg.gamma)
+                )
+                for leg in (self.legs[1], self.legs[2], self.legs[3], self.legs[4])
+            ),
+            legs_offset_v=self.legs_offset_v,
+            legs_offset_h_x=self.legs_offset_h_x,
+            legs_offset_h_y=self.legs_offset_h_y,
+            body=body
+        )
+
+    @classmethod
+    def from_state(cls, state: KinematicsState, init_snapshot=True) -> 'FenixKinematics':
+        """
+        Restores a model without IK. Logging is already configured
+        by the model the state was taken from
+        """
+        fk = cls.__new__(cls)
+        fk.logger = logging.getLogger('main_logger')
+        fk.legs = {
+            leg_num: Leg.restore(Point(*O), Point(*D), angles)
+            for leg_num, (O, D, angles) in enumerate(state.legs, start=1)
+        }
+        fk.legs_offset_v = state.legs_offset_v
+        fk.legs_offset_h_x = state.legs_offset_h_x
+        fk.legs_offset_h_y = state.legs_offset_h_y
+        fk.init_body_state()
+        if state.body is not None:
+            for name, value in state.body.items():
+                setattr(fk, name, copy.deepcopy(value))
+
+        fk.history = SnapshotHistory()
         if init_snapshot:
-            self.add_angles_snapshot('init')
+            fk.add_angles_snapshot('init')
+        return fk
+
+    def clone(self, init_snapshot=True) -> 'FenixKinematics':
+        """
+        Copy of the model with its body state, history is started anew
+        """
+        return FenixKinematics.from_state(self.get_state(), init_snapshot)
+
+    @classmethod
+    def from_position(cls, fenix_position: FenixPosition = None, init_snapshot=True) -> 'FenixKinematics':
+        """
+        Same as FenixKinematics(fenix_position), but models built from a position
+        are remembered, and the next time the same position is restored without IK
+        """
+        key = None if fenix_position is None else tuple(fenix_position.angles)
+        state = kinematics_states.get(key)
+        if state is None:
+            fk = cls(fenix_position=fenix_position, init_snapshot=init_snapshot)
+            if code_config.kinematics_states_cache_size > 0:
+                kinematics_states[key] = fk.get_state(with_body=False)
+                while len(kinematics_states) > code_config.kinematics_states_cache_size:
+                    kinematics_states.popitem(last=False)
+            return fk
+        kinematics_states.move_to_end(key)
+        return cls.from_state(state, init_snapshot)
 
     def get_sequence_length(self):
-        sum_diff = 0
-        for i in range(len(self.sequence) - 1):
-            max_diff = 0
-            for a, b in zip(self.sequence[i].angles_snapshot, self.sequence[i+1].angles_snapshot):
-                max_diff = max(max_diff, abs(a - b))
-            sum_diff += max_diff
-        
-        return round(sum_diff)
+        # sum of max servo angle changes between neighbouring snapshots
+        servo_angles = self.history.servo_angles
+        error = self.history.first_error()
+        if error is not None:
+            raise error
+        if len(servo_angles) < 2:
+            return 0
+        return round(float(np.abs(np.diff(servo_angles, axis=0)).max(axis=1).sum()))
     
     def reset_history(self):
-        self.angles_history = []
+        self.history.clear()
 
     def add_angles_snapshot(self, move_type: str = 'unknown'):
-        fp = FenixPosition(
-            leg1_tetta=self.legs[1].tetta, 
-            leg1_alpha=self.legs[1].alpha, 
-            leg1_beta=self.legs[1].beta, 
-            leg1_gamma=self.legs[1].gamma,  
-            leg2_tetta=self.legs[2].tetta, 
-            leg2_alpha=self.legs[2].alpha, 
-            leg2_beta=self.legs[2].beta, 
-            leg2_gamma=self.legs[2].gamma,
-            leg3_tetta=self.legs[3].tetta, 
-            leg3_alpha=self.legs[3].alpha, 
-            leg3_beta=self.legs[3].beta, 
-            leg3_gamma=self.legs[3].gamma,
-            leg4_tetta=self.legs[4].tetta, 
-            leg4_alpha=self.legs[4].alpha, 
-            leg4_beta=self.legs[4].beta, 
-            leg4_gamma=self.legs[4].gamma
+        legs = (self.legs[1], self.legs[2], self.legs[3], self.legs[4])
+        fp = FenixPosition.from_servo(
+            angle for leg in legs for angle in (leg.gamma, leg.beta, leg.alpha, leg.tetta)
+        )
+        # converted once here, sequence only reads it.
+        # Bad snapshot is raised when the sequence is requested, as before
+        try:
+            servo_angles, error = convert_legs_angles_C(fp, self.logger).to_servo(), None
+        except AnglesException as e:
+            servo_angles, error = None, e
+        self.history.append(
+            move_type,
+            fp.to_servo(),
+            [(leg.D.x, leg.D.y, leg.D.z) for leg in legs],
+            servo_angles,
+            error
         )
 
-        #new_move = MoveSnapshot(move_type, convert_legs_angles(angles_in))
-        new_move = MoveSnapshot(move_type, fp)
-        self.angles_history.append(new_move)
-        
-        self.D_points_history.append(
-            [
-                copy.deepcopy(self.legs[1].D),
-                copy.deepcopy(self.legs[2].D),
-                copy.deepcopy(self.legs[3].D),
-                copy.deepcopy(self.legs[4].D)
-            ])
+    @property
+    def angles_history(self) -> List[MoveSnapshot]:
+        return [
+            MoveSnapshot(self.history.move_type(i), FenixPosition.from_servo(angles))
+            for i, angles in enumerate(self.history.angles.tolist())
+        ]
+
+    @property
+    def D_points_history(self) -> np.ndarray:
+        # N x 4 x 3 array of legs D points
+        return self.history.D_points
+
+    def check_leg_target(self, leg_num: int, leg_delta: List[float], body_delta: List[float] = (0, 0, 0)) -> Reachability:
+        """
+        Can the foot of leg_num be moved by leg_delta, while the body is moved by body_delta.
+        Uses reachability map, no IK is run and nothing is changed
+        """
+        if reachability.reachability_map is None and enable_reachability_map(self.logger) is None:
+            # map is disabled, nothing is known
+            return Reachability(True, 0.0)
+        leg = self.legs[leg_num]
+        O = Point(leg.O.x + body_delta[0], leg.O.y + body_delta[1], leg.O.z + body_delta[2])
+        D = Point(leg.D.x + leg_delta[0], leg.D.y + leg_delta[1], leg.D.z + leg_delta[2])
+        return reachability.reachability_map.check_point(O, D)
+
+    def legs_reachable(
+            self, 
+            leg_deltas: Dict[int, List[float]], 
+            body_delta: List[float] = (0, 0, 0), 
+            min_margin: float = 0
+        ) -> bool:
+        """
+        Early check for a candidate move: all legs (moved by leg_deltas, others stay)
+        are reachable with at least min_margin degrees to joint limits
+        and tettas of neighbouring legs are correct
+        """
+        tettas = []
+        for leg_num, leg in self.legs.items():
+            leg_delta = leg_deltas.get(leg_num, (0, 0, 0))
+            result = self.check_leg_target(leg_num, leg_delta, body_delta)
+            if not result.reachable or (min_margin > 0 and result.margin < min_margin):
+                return False
+            tettas.append(math.atan2(
+                leg.D.y + leg_delta[1] - leg.O.y - body_delta[1],
+                leg.D.x + leg_delta[0] - leg.O.x - body_delta[0]
+            ))
+        return tettas_reachable(tettas)
+
+    def history_violations(self) -> np.ndarray:
+        """
+        Validates the whole plan in history at once with array constraints.
+        Returns violation codes of shape (N, 4), one per leg of every snapshot,
+        see VIOLATION_* in constraints. All zeros means the plan is correct
+        """
+        # servo order: gamma, beta, alpha, tetta for legs 1-4
+        angles = np.degrees(self.history.angles.reshape(-1, 4, 4))
+        violations = leg_angles_violations_batch(
+            angles[..., 2], angles[..., 1], angles[..., 0], logger=self.logger
+        )
+        # same tettas as convert_legs_angles_C checks
+        violations |= tettas_violations_batch(np.round(angles[..., 3] + TETTA_OFFSETS, 2), self.logger)
+        return violations
 
     @property
     def height(self):
@@ -199,10 +411,17 @@ class FenixKinematics:
 
     @property
     def sequence(self):
-        sequence = []
-        for move in self.angles_history:
-            sequence.append(MoveSnapshot(move.move_type, convert_legs_angles_C(move.angles_snapshot, self.logger)))
-        return sequence
+        error = self.history.first_error()
+        if error is not None:
+            raise error
+        # angles from the table, the cache or differential IK are checked here too
+        violations = self.history_violations()
+        if violations.any():
+            snapshot, leg = (int(x) for x in np.argwhere(violations)[0])
+            raise AnglesException(
+                f'Snapshot {snapshot}, leg {leg + 1} : {describe_violations(violations[snapshot, leg])}'
+            )
+        return self.history.sequence()
         #return self.angles_history
     
     def build_legs_from_angles(self, fp: FenixPosition):
@@ -245,7 +464,7 @@ class FenixKinematics:
     @property
     def current_position(self):
         #return convert_legs_angles_back(self.sequence[-1].angles_snapshot)
-        return self.angles_history[-1].angles_snapshot
+        return FenixPosition.from_servo(self.history.angles[-1].tolist())
 
     def initiate_legs(self):
         O1 = Point(cfg.leg["mount_point_offset"],
@@ -290,7 +509,7 @@ class FenixKinematics:
     
     ################## MOVEMENTS START HERE ##################
     def leg_movement(self, leg_num, leg_delta, snapshot=True):
-        self.logger.info(f'Leg move {leg_num}: {leg_delta}')
+        self.logger.info('Leg move %s: %s', leg_num, leg_delta)
         leg = self.legs[leg_num]
 
         leg.move_end_point(leg_delta[0], leg_delta[1], leg_delta[2])
@@ -298,7 +517,7 @@ class FenixKinematics:
             self.add_angles_snapshot('endpoint')
 
     def body_movement(self, delta_x, delta_y, delta_z, snapshot=True):
-        self.logger.info(f'Body movement [{delta_x}, {delta_y}, {delta_z}]')
+        self.logger.info('Body movement [%s, %s, %s]', delta_x, delta_y, delta_z)
         self.current_body_delta = [x + y for x, y in zip(self.current_body_delta, [delta_x, delta_y, delta_z])]
         #print(f'self.current_body_delta : {self.current_body_delta}')
         if delta_x == delta_y == delta_z == 0:
@@ -312,6 +531,112 @@ class FenixKinematics:
 
         self.current_legs_offset_v -= delta_z
 
+    def body_pose_infeasibility(
+            self, 
+            pose: List[float], 
+            O: np.ndarray, 
+            D: np.ndarray, 
+            errors: Dict[int, Exception], 
+            tettas: List[float]
+        ) -> Optional[BodyPoseInfeasibility]:
+        """
+        Reasons for the legs without a solution (errors) and for bad tettas, None if there are none
+        """
+        legs = {}
+        a, b, c, d = cfg.leg["a"], cfg.leg["b"], cfg.leg["c"], cfg.leg["d"]
+        for leg_num, error in errors.items():
+            i = leg_num - 1
+            l = round(math.hypot(D[i, 0] - O[i, 0], D[i, 1] - O[i, 1]) - d, 2)
+            delta_z = round(D[i, 2] - O[i, 2], 2)
+            if math.hypot(l, delta_z) > a + b + c or l < 0:
+                legs[leg_num] = f'out of reach, l = {l}, delta_z = {delta_z}'
+                continue
+            # limits broken with the preferred foot angle, the solver tried others too
+            alpha, beta, gamma, _ = solve_ksi_batch(np.array(l), np.array(delta_z), PREFERRED_FOOT_ANGLE + 90)
+            violations = leg_angles_violations_batch(np.degrees(alpha), np.degrees(beta), np.degrees(gamma))
+            legs[leg_num] = f'{error}, joint limits {describe_violations(violations[-1])}, l = {l}, delta_z = {delta_z}'
+
+        bad_tettas = []
+        if not legs and not tettas_reachable(tettas):
+            violations = tettas_violations_batch(np.round(np.degrees(tettas) + TETTA_OFFSETS, 2))
+            bad_tettas = (np.flatnonzero(violations) + 1).tolist()
+
+        if not legs and not bad_tettas:
+            return None
+        return BodyPoseInfeasibility(tuple(pose), legs, bad_tettas)
+
+    def set_body_pose(
+            self, 
+            x: float = 0, 
+            y: float = 0, 
+            z: float = 0, 
+            roll: float = 0, 
+            pitch: float = 0, 
+            yaw: float = 0, 
+            snapshot: bool = True
+        ):
+        """
+        Moves the body to the pose relative to where it was before the first
+        set_body_pose: shift in cm, angles in degrees around the body center.
+        Roll and pitch move mount points with one rotation matrix, as look_on_angle does.
+        Model axes are the body axes (tetta is measured from them),
+        so yaw turns the feet the other way around the body center, as turn does.
+        Feet stay in place on the ground.
+        Returns the new MoveSnapshot (None if snapshot is False)
+        or BodyPoseInfeasibility, then nothing is changed
+        """
+        pose = [x, y, z, roll, pitch, yaw]
+        self.logger.info('Body pose %s', pose)
+        legs = (self.legs[1], self.legs[2], self.legs[3], self.legs[4])
+        O_current = np.array([(leg.O.x, leg.O.y, leg.O.z) for leg in legs])
+        D_current = np.array([(leg.D.x, leg.D.y, leg.D.z) for leg in legs])
+
+        # previous pose is taken back first, rotation is around the center of mount points
+        previous_shift = np.array(self.body_pose[:3], dtype=float)
+        center = O_current.mean(axis=0) - previous_shift
+        O_neutral = (O_current - previous_shift - center) @ body_rotation_matrix(*self.body_pose[3:5], 0)
+        O = np.round(O_neutral @ body_rotation_matrix(roll, pitch, 0).T + center + pose[:3], 2)
+
+        D = D_current
+        if yaw != self.body_pose[5]:
+            # around the vertical axis through the center, z is not changed
+            D_neutral = (D_current - center) @ body_rotation_matrix(0, 0, -self.body_pose[5])
+            D = np.round(D_neutral @ body_rotation_matrix(0, 0, -yaw).T + center, 2)
+            D[:, 2] = D_current[:, 2]
+
+        # for 4 legs the table backed solver is faster than the array one
+        new_angles, errors = [], {}
+        for i, leg in enumerate(legs):
+            try:
+                new_angles.append(calculate_leg_angles(
+                    Point(*O[i].tolist()), Point(*D[i].tolist()), leg.logger, (leg.alpha, leg.beta, leg.gamma)
+                ))
+            except (AnglesException, DistanceException, ValueError) as e:
+                errors[i + 1] = e
+                new_angles.append(None)
+
+        tettas = [angles[0] for angles in new_angles if angles is not None]
+        infeasibility = self.body_pose_infeasibility(pose, O, D, errors, tettas)
+        if infeasibility is not None:
+            self.logger.info(str(infeasibility))
+            return infeasibility
+
+        for i, leg in enumerate(legs):
+            leg.O = Point(*O[i].tolist())
+            leg.D = Point(*D[i].tolist())
+            leg.tetta, leg.alpha, leg.beta, leg.gamma = new_angles[i]
+
+        self.current_body_delta = [
+            delta + new - old for delta, new, old in zip(self.current_body_delta, pose[:3], self.body_pose[:3])
+        ]
+        self.current_legs_offset_v -= pose[2] - self.body_pose[2]
+        self.body_pose = pose
+
+        if not snapshot:
+            return None
+        self.add_angles_snapshot('body')
+        return MoveSnapshot('body', FenixPosition.from_servo(self.history.servo_angles[-1].tolist()))
+
     # ?
     def start(self):
         self.body_movement(0, 0, -cfg.start["vertical"] + cfg.start["initial_z_position_delta"])
@@ -337,7 +662,7 @@ class FenixKinematics:
         return {"x": x_offset, "y": y_offset}
     
     def switch_mode(self, mode: str):
-        self.logger.info(f'Switching mode to {mode}')
+        self.logger.info('Switching mode to %s', mode)
         self.reset()
         required_xy = cfg.modes[mode]
         current_xy = self.legs_D_offsets()
@@ -370,7 +695,7 @@ class FenixKinematics:
         # move body to center
         
         body_delta_xy = self.body_delta_xy(delta_y, delta_x)
-        self.logger.info(f'Moving body: {body_delta_xy}')
+        self.logger.info('Moving body: %s', body_delta_xy)
         self.body_movement(-body_delta_xy[0],
                            -body_delta_xy[1],
                            0, 
@@ -399,7 +724,7 @@ class FenixKinematics:
 
     def body_compensation_for_a_leg(self, leg_num):        
         target = self.target_body_position(leg_num)
-        self.logger.info(f'Move. body_compensation_for_a_leg. Target : {target}')
+        self.logger.info('Move. body_compensation_for_a_leg. Target : %s', target)
         current_body_x = (self.legs[1].O.x +
                           self.legs[2].O.x +
                           self.legs[3].O.x +
@@ -416,16 +741,16 @@ class FenixKinematics:
 
     def compensated_leg_movement(self, leg_num, leg_delta):
         # moving body to compensate future movement
-        self.logger.info(f'Processing leg {leg_num} body_compensation_for_a_leg')
+        self.logger.info('Processing leg %s body_compensation_for_a_leg', leg_num)
         self.body_compensation_for_a_leg(leg_num)
 
-        self.logger.info(f'Processing leg {leg_num} move_end_point {leg_delta}')
+        self.logger.info('Processing leg %s move_end_point %s', leg_num, leg_delta)
         self.legs[leg_num].move_end_point(*leg_delta)
         self.add_angles_snapshot('endpoint')
 
     def leg_move_with_compensation(self, leg_num, delta_x, delta_y):
         self.compensated_leg_movement(leg_num, [delta_x, delta_y, self.leg_up_single])
-        self.logger.info(f'Processing leg {leg_num} move_end_point {[0, 0, -self.leg_up_single]}')
+        self.logger.info('Processing leg %s move_end_point %s', leg_num, [0, 0, -self.leg_up_single])
         self.move_leg_endpoint(leg_num, [0, 0, -self.leg_up_single])
         self.add_angles_snapshot('endpoint')
         #self.compensated_leg_movement(leg_num, [0, 0, -self.leg_up])
@@ -472,7 +797,7 @@ class FenixKinematics:
 
         new_delta = [round(target_x - leg.D.x, 1), round(target_y - leg.D.y, 1), round(target_z - leg.D.z + min_z, 1)]
         print(f'Legnum: {leg_num}.\nOriginal delta: {leg_delta}\nNew delta: {new_delta}')
-        self.logger.info(f'move_leg_endpoint_abs. Legnum: {leg_num}.\nOriginal delta: {leg_delta}\nNew delta: {new_delta}')
+        self.logger.info('move_leg_endpoint_abs. Legnum: %s.\nOriginal delta: %s\nNew delta: %s', leg_num, leg_delta, new_delta)
         self.legs[leg_num].move_end_point(*new_delta)
         #self.legs_deltas[leg_num] = [x + y for x, y in zip(self.legs_deltas[leg_num], leg_delta)]        
         if add_snapshot:
@@ -487,9 +812,9 @@ class FenixKinematics:
     
     def move_body_straight(self, delta_x, delta_y, leg_seq=[1, 3, 4, 2]):
         for leg_number in leg_seq:
-            self.logger.info(f'Processing leg {leg_number} with compensation')
+            self.logger.info('Processing leg %s with compensation', leg_number)
             self.leg_move_with_compensation(leg_number, delta_x, delta_y)
-        self.logger.info(f'Processing body to center')
+        self.logger.info('Processing body to center')
         self.body_to_center()
     """
     def move_body_straight_(self, delta_x, delta_y, leg_seq=[1, 3, 4, 2]):
@@ -979,7 +1304,7 @@ class FenixKinematics:
         self.current_legs_offset_v += delta_z
     """
     def reposition_legs(self, delta_x, delta_y):
-        self.logger.info(f'reposition_legs ({delta_x}, {delta_y})')
+        self.logger.info('reposition_legs (%s, %s)', delta_x, delta_y)
         if delta_x == delta_y == 0:
             return None
 
@@ -1216,21 +1541,21 @@ class FenixKinematics:
         x_move = 10
         if leg_num == 2:
             x_move = -10
-        self.logger.info(f'Processing leg {leg_num} body_compensation_for_a_leg')
+        self.logger.info('Processing leg %s body_compensation_for_a_leg', leg_num)
         self.body_compensation_for_a_leg(leg_num)
-        self.logger.info(f'Processing leg {leg_num} move_end_point 1')
+        self.logger.info('Processing leg %s move_end_point 1', leg_num)
         self.legs[leg_num].move_end_point(10, -x_move, 5)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 2')
+        self.logger.info('Processing leg %s move_end_point 2', leg_num)
         self.legs[leg_num].move_end_point(13, 0, 10)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 3')
+        self.logger.info('Processing leg %s move_end_point 3', leg_num)
         self.legs[leg_num].move_end_point(-13, 0, -10)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 4')
+        self.logger.info('Processing leg %s move_end_point 4', leg_num)
         self.legs[leg_num].move_end_point(-10, x_move, 0)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 5')
+        self.logger.info('Processing leg %s move_end_point 5', leg_num)
         self.legs[leg_num].move_end_point(0, 0, -5)
         self.add_angles_snapshot('endpoint')
         self.body_to_center()
@@ -1239,21 +1564,21 @@ class FenixKinematics:
         x_move = 10
         if leg_num == 2:
             x_move = -10
-        self.logger.info(f'Processing leg {leg_num} body_compensation_for_a_leg')
+        self.logger.info('Processing leg %s body_compensation_for_a_leg', leg_num)
         self.body_compensation_for_a_leg(leg_num)
-        self.logger.info(f'Processing leg {leg_num} move_end_point 1')
+        self.logger.info('Processing leg %s move_end_point 1', leg_num)
         self.legs[leg_num].move_end_point(10, -x_move, 5)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 2')
+        self.logger.info('Processing leg %s move_end_point 2', leg_num)
         self.legs[leg_num].move_end_point(-15, 2*x_move, 3)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 3')
+        self.logger.info('Processing leg %s move_end_point 3', leg_num)
         self.legs[leg_num].move_end_point(15, -2*x_move, -3)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 4')
+        self.logger.info('Processing leg %s move_end_point 4', leg_num)
         self.legs[leg_num].move_end_point(-10, x_move, 0)
         self.add_angles_snapshot('endpoint')
-        self.logger.info(f'Processing leg {leg_num} move_end_point 5')
+        self.logger.info('Processing leg %s move_end_point 5', leg_num)
         self.legs[leg_num].move_end_point(0, 0, -5)
         self.add_angles_snapshot('endpoint')
         self.body_to_center()
@@ -1330,14 +1655,14 @@ class FenixKinematics:
 
     def move_1_legged_for_diff(self, move: Move):
         #for leg_number, deltas in move.target_legs_position.items():
-        self.logger.info(f'Move. : {move}')
+        self.logger.info('Move. : %s', move)
 
         self.body_movement(-6, 0, 0)
 
         for leg_number in [1, 2, 3, 4]:
             if leg_number == 3:
                 self.body_movement(12 + diff[0], 0, 0) # diff[0] here is crutch
-            self.logger.info(f'Leg {leg_number}')
+            self.logger.info('Leg %s', leg_number)
             deltas = move.target_legs_position[leg_number]
             #self.logger.info(f'Move. Deltas : {deltas}')
             C = self.legs[leg_number].C
@@ -1345,7 +1670,7 @@ class FenixKinematics:
             plan_y = deltas[1]
             plan_z = deltas[2]
             diff = [plan_x - C.x, plan_y - C.y, plan_z - C.z]
-            self.logger.info(f'Move. Diff : {diff}')
+            self.logger.info('Move. Diff : %s', diff)
             self.leg_move_obstacled(leg_number, *diff, move_type=2)
 
         self.body_to_center()
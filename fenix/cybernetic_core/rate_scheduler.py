@@ -0,0 +1,111 @@
+"""
+Shortest durations of snapshots of a sequence from joint velocity and acceleration limits.
+A joint moves with a trapezoidal velocity profile: it speeds up with max acceleration,
+goes with max velocity and slows down the same way. A joint that goes on in the same
+direction in the next snapshot does not stop between them, so it speeds up only once.
+A snapshot takes the time of its slowest joint, limits are divided by the load of its move type.
+
+Rates and wait times are the same, that set_servo_values_not_paced_v2 uses,
+but every snapshot gets its own instead of speed * max_angle_diff / 45.
+"""
+import sys
+import os
+import logging
+from dataclasses import dataclass
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from cybernetic_core.cybernetic_utils.history import SnapshotSequence, MOVE_TYPES
+from cybernetic_core.trajectory import segment_durations
+import configs.config as cfg
+
+# servo order of joints in every leg
+JOINTS = ['gamma', 'beta', 'alpha', 'tetta']
+# degrees, smaller moves are not considered as a move in some direction
+MIN_JOINT_MOVE = 0.5
+
+
+@dataclass
+class RateSchedule:
+    # ms for every snapshot to be reached, the first one is the current position, its rate is 0
+    rates: np.ndarray
+    # seconds from sending a snapshot to sending the next one
+    wait_times: np.ndarray
+    # seconds the same sequence takes with rates from speed
+    speed_rule_time: float
+
+    def __len__(self):
+        return len(self.rates)
+
+    @property
+    def predicted_time(self) -> float:
+        return float(self.wait_times.sum())
+
+    def log(self, logger) -> None:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('[SCHEDULE] Rates : %s', self.rates.tolist())
+        logger.info('[SCHEDULE] Predicted : %s s. Speed rule : %s s', round(self.predicted_time, 3), round(self.speed_rule_time, 3))
+
+
+def joint_limits(name: str) -> np.ndarray:
+    """
+    Limit of every servo in servo order, shape (16)
+    """
+    return np.tile([cfg.servo_limits[name][joint] for joint in JOINTS], 4).astype(float)
+
+def move_type_loads(move_type_codes: np.ndarray) -> np.ndarray:
+    loads = np.array([cfg.servo_limits["load"].get(move_type, 1.0) for move_type in MOVE_TYPES])
+    return loads[move_type_codes]
+
+def minimum_joint_times(
+        deltas: np.ndarray, 
+        starts_from_rest: np.ndarray, 
+        ends_at_rest: np.ndarray, 
+        max_velocity: np.ndarray, 
+        max_acceleration: np.ndarray
+    ) -> np.ndarray:
+    """
+    Seconds for every joint to move by deltas (degrees).
+    Speeding up and slowing down add max_velocity / max_acceleration / 2 each,
+    if the move is too short to get to max velocity, the profile is a triangle
+    """
+    deltas = np.abs(deltas)
+    ramps = starts_from_rest.astype(int) + ends_at_rest
+    # distance to speed up to max velocity and slow down from it
+    ramps_distance = ramps * max_velocity ** 2 / (2 * max_acceleration)
+    trapezoid = deltas / max_velocity + ramps * max_velocity / (2 * max_acceleration)
+    # one ramp is the half of a triangle with both of them
+    triangle = np.where(ramps == 2, 2, np.sqrt(2)) * np.sqrt(deltas / max_acceleration)
+    return np.where((ramps == 0) | (deltas >= ramps_distance), trapezoid, triangle)
+
+def schedule_sequence(sequence: SnapshotSequence, speed: int, body_speed: int = None) -> RateSchedule:
+    """
+    speed and body_speed are used only to compare with the rates they give
+    """
+    servo_angles = np.asarray(sequence.servo_angles, dtype=float)
+    if len(servo_angles) < 2:
+        return RateSchedule(np.zeros(len(servo_angles), dtype=int), np.zeros(len(servo_angles)), 0.0)
+
+    deltas = np.diff(servo_angles, axis=0)
+    directions = np.where(np.abs(deltas) < MIN_JOINT_MOVE, 0, np.sign(deltas))
+    # a joint does not stop between two snapshots, if it goes on in the same direction
+    goes_on = (directions[:-1] == directions[1:]) & (directions[1:] != 0)
+    starts_from_rest = np.vstack([np.ones((1, 16), dtype=bool), ~goes_on])
+    ends_at_rest = np.vstack([~goes_on, np.ones((1, 16), dtype=bool)])
+
+    loads = move_type_loads(sequence.move_type_codes[1:])[:, None]
+    times = minimum_joint_times(
+        deltas, 
+        starts_from_rest, 
+        ends_at_rest,
+        joint_limits("max_velocity") / loads,
+        joint_limits("max_acceleration") / loads
+    )
+    rates = np.concatenate([[0], np.ceil(times.max(axis=1) * 1000)]).astype(int)
+    wait_times = np.maximum(0, rates / 1000 - cfg.fenix['movement_command_advance_ms'])
+    wait_times[0] = 0
+
+    speed_rule_rates = np.round(segment_durations(sequence, speed, body_speed) * 1000)
+    speed_rule_time = float(np.maximum(0, speed_rule_rates / 1000 - cfg.fenix['movement_command_advance_ms']).sum())
+    return RateSchedule(rates, wait_times, speed_rule_time)
@@ -2,16 +2,16 @@ from typing import List, Tuple
 import sys
 import os
 import math
-from joblib import Memory
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from cybernetic_core.kinematics import FenixKinematics
 from configs import config as cfg
 from configs import code_config
 from cybernetic_core.cybernetic_utils.moves import Sequence
 from cybernetic_core.geometry.angles import FenixPosition
+from cybernetic_core.gait_library import GaitLibrary
+from core.utils.multiphase_moves import TRANSITION_COMMANDS
 
 #from functools import cache
-memory = Memory(code_config.cache_dir, verbose=0)
 
 UP_OR_DOWN_CM   = cfg.moves["up_or_down_cm"]
 FORWARD_BODY_CM = cfg.moves["move_body_cm"]
@@ -32,6 +32,9 @@ class VirtualFenix():
         self.logger = logger
         self.side_look_angle = 0
         self.vertical_look_angle = 0
+        self.gait_library = None
+        if code_config.gait_library_enabled:
+            self.gait_library = GaitLibrary.load(logger=logger)
 
     def get_sequence(self, command: str, fenix_position: FenixPosition, kwargs=None):
         if command == 'look_left':
@@ -55,26 +58,31 @@ class VirtualFenix():
                 return None, None
             self.vertical_look_angle += VERTICAL_LOOK_ANGLE
         
+        if self.gait_library is not None and kwargs is None:
+            sequence, new_position = self.gait_library.get(command, fenix_position)
+            if sequence is not None:
+                self.logger.info(f'[GAIT] {command} taken from gait library')
+                return sequence, new_position
+
         sequence, new_position = get_sequence_for_command_cached(command, fenix_position, kwargs)
         return sequence, new_position
 
     def get_height(self, fenix_position: FenixPosition):
-        fk = FenixKinematics(fenix_position=fenix_position)
+        fk = FenixKinematics.from_position(fenix_position, init_snapshot=False)
         return fk.height + 13
 
     def get_leg_angle_to_surface(self, fenix_position: FenixPosition, leg_num: int):
-        fk = FenixKinematics(fenix_position=fenix_position)
+        fk = FenixKinematics.from_position(fenix_position, init_snapshot=False)
         print(math.degrees(fk.legs[leg_num].alpha), math.degrees(fk.legs[leg_num].beta))
         return math.degrees(fk.legs[leg_num].alpha - fk.legs[leg_num].beta)
 
     def get_legs_zs(self, fenix_position: FenixPosition):
-        fk = FenixKinematics(fenix_position=fenix_position)
-        return [leg.O.z - leg.C.z for leg in fk.legs.values()]
+        fk = FenixKinematics.from_position(fenix_position, init_snapshot=False)
+        return [leg.O.z - leg.D.z for leg in fk.legs.values()]
 
 #@cache
-#@memory.cache
 def get_sequence_for_command_cached(command: str, fenix_position: FenixPosition, kwargs=None) -> Sequence:
-    fk = FenixKinematics(fenix_position=fenix_position)
+    fk = FenixKinematics.from_position(fenix_position)
     
     if command == 'forward_1':
         # Legs 1 and 3 moved x1
@@ -94,6 +102,13 @@ def get_sequence_for_command_cached(command: str, fenix_position: FenixPosition,
     elif command == 'forward_32':
         # Legs 1 and 3 moved x1
         fk.move_2_legs_phased_13(FORWARD_LEGS_2LEG_CM, 0)
+    elif command in TRANSITION_COMMANDS:
+        # diagonal step from the middle of one two-legged gait to the middle of another
+        legs, (direction_x, direction_y) = TRANSITION_COMMANDS[command]
+        if legs == '13':
+            fk.move_2_legs_phased_13(direction_x * FORWARD_LEGS_2LEG_CM, direction_y * FORWARD_LEGS_2LEG_CM)
+        else:
+            fk.move_2_legs_phased_24(direction_x * FORWARD_LEGS_2LEG_CM, direction_y * FORWARD_LEGS_2LEG_CM)
     elif command == 'approach_obstacle':
         fk.move_2_legs_phased_13(5, 0)
         for _ in range(4):
@@ -5,11 +5,11 @@ import math
 from joblib import Memory
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from cybernetic_core.kinematics import FenixKinematics
+from cybernetic_core.kinematics import FenixKinematics, BodyPoseInfeasibility
 from configs import config as cfg
 from configs import code_config
 from cybernetic_core.cybernetic_utils.moves import Sequence
-from cybernetic_core.geometry.angles import FenixPosition
+from cybernetic_core.geometry.angles import FenixPosition, AnglesException
 
 #from functools import cache
 memory = Memory(code_config.cache_dir, verbose=0)
@@ -139,7 +139,7 @@ def get_sequence_for_command(command: str, kwargs=None) -> Sequence:
     return sequence
 
 def get_angles_for_sequence(move: Move, fenix_position: FenixPosition):
-    fk = FenixKinematics(fenix_position=fenix_position, init_snapshot=False)
+    fk = FenixKinematics.from_position(fenix_position, init_snapshot=False)
     print(f'Move: {move.move_type}. {move.values}')
     print('Legs Ds: ', [leg.D for leg in fk.legs.values()])
     # print(f'fenix_position: {fenix_position}')
@@ -148,6 +148,10 @@ def get_angles_for_sequence(move: Move, fenix_position: FenixPosition):
         fk.body_movement(*move.values['deltas'])
     elif move.move_type == 'body_to_center':
         fk.body_to_center()
+    elif move.move_type == 'body_pose':
+        result = fk.set_body_pose(*move.values['pose'])
+        if isinstance(result, BodyPoseInfeasibility):
+            raise AnglesException(str(result))
     #elif move.move_type == 'compensated_leg_movement':
     #    fk.compensated_leg_movement(move.values['leg'], move.values['deltas'])
     elif move.move_type == 'body_compensation_for_a_leg':
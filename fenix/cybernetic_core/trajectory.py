@@ -0,0 +1,170 @@
+"""
+Time-parameterized trajectories between snapshots of a sequence.
+Snapshots are keyframes: feet are taken to body coordinates by forward kinematics,
+joined by monotone cubic splines and sampled at a fixed rate, every frame is solved
+with batch IK. Foot angles are interpolated too, the full IK search would jump
+between whole degree foot angles from frame to frame.
+Legs do not stop at every keyframe, only at the ends of the sequence.
+
+Monotone splines do not overshoot keyframes, so a foot never goes below the ground
+it is put on, and a standing foot stays still. A raised foot moves along a rounded arc
+instead of joint space straight lines.
+"""
+import sys
+import os
+from typing import List
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from cybernetic_core.geometry.angles_batch import (
+    TETTA_OFFSETS, calculate_D_points_batch, convert_legs_angles_batch, solve_ksi_batch
+)
+from cybernetic_core.cybernetic_utils.constraints import tettas_correct_batch
+from cybernetic_core.cybernetic_utils.history import SnapshotSequence, move_type_code
+import configs.config as cfg
+
+# degrees from the interpolated foot angle to look for a reachable one
+FOOT_ANGLE_SEARCH = 20
+
+
+def convert_legs_angles_to_kinematic_batch(servo_angles: np.ndarray):
+    """
+    Array version of convert_legs_angles_to_kinematic.
+    Input has shape (N, 16), degrees, in servo order.
+    Returns tetta, alpha, beta, gamma with shape (N, 4), radians
+    """
+    servo = np.asarray(servo_angles, dtype=float).reshape(-1, 4, 4)
+    gamma = -np.radians(servo[..., 0])
+    beta = np.radians(-servo[..., 1] - 90)
+    alpha = np.radians(servo[..., 2])
+    tetta = np.radians(servo[..., 3] - TETTA_OFFSETS)
+    return tetta, alpha, beta, gamma
+
+def mount_points() -> np.ndarray:
+    """
+    O points of legs 1 to 4 in body coordinates, shape (4, 3)
+    """
+    offset = cfg.leg["mount_point_offset"]
+    return np.array([
+        [offset, offset, 0],
+        [offset, -offset, 0],
+        [-offset, -offset, 0],
+        [-offset, offset, 0],
+    ], dtype=float)
+
+def feet_points_batch(servo_angles: np.ndarray) -> np.ndarray:
+    """
+    D points in body coordinates for every position, shape (N, 4, 3)
+    """
+    tetta, alpha, beta, gamma = convert_legs_angles_to_kinematic_batch(servo_angles)
+    return calculate_D_points_batch(mount_points(), tetta, alpha, beta, gamma)
+
+def segment_durations(sequence: SnapshotSequence, speed: int, body_speed: int = None) -> np.ndarray:
+    """
+    Seconds between neighbouring snapshots, the same as set_servo_values_not_paced_v2 waits:
+    speed is normalized to 45 degrees of the biggest servo move
+    """
+    if body_speed is None:
+        body_speed = speed
+    speeds = np.where(sequence.move_type_codes[1:] == move_type_code('body'), body_speed, speed)
+    max_angle_diff = np.abs(np.diff(sequence.servo_angles, axis=0)).max(axis=1)
+    return speeds * max_angle_diff / 45 / 1000
+
+def monotone_cubic(knots: np.ndarray, values: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """
+    Fritsch-Carlson monotone cubic through (knots, values), evaluated at times.
+    values has shape (K, ...), result (len(times), ...). Slopes at the ends are 0
+    """
+    h = np.diff(knots)
+    h_values = h.reshape((-1,) + (1,) * (values.ndim - 1))
+    delta = np.diff(values, axis=0) / h_values
+
+    slopes = np.zeros(values.shape)
+    if len(knots) > 2:
+        w1 = (2 * h[1:] + h[:-1]).reshape((-1,) + (1,) * (values.ndim - 1))
+        w2 = (h[1:] + 2 * h[:-1]).reshape((-1,) + (1,) * (values.ndim - 1))
+        same_direction = delta[:-1] * delta[1:] > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            harmonic = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+        slopes[1:-1] = np.where(same_direction, harmonic, 0)
+
+    i = np.clip(np.searchsorted(knots, times, side='right') - 1, 0, len(knots) - 2)
+    s = ((times - knots[i]) / h[i]).reshape((-1,) + (1,) * (values.ndim - 1))
+    h_i = h_values[i]
+    return (2 * s ** 3 - 3 * s ** 2 + 1) * values[i] + \
+        (s ** 3 - 2 * s ** 2 + s) * h_i * slopes[i] + \
+        (-2 * s ** 3 + 3 * s ** 2) * values[i + 1] + \
+        (s ** 3 - s ** 2) * h_i * slopes[i + 1]
+
+def choose_candidate(alpha, beta, gamma, valid):
+    """
+    First valid of the candidates on the last axes (ksi, then gamma coef),
+    gamma coef 1 is taken on ties as in find_best_angles_batch
+    """
+    shape = valid.shape[:-2]
+    alpha, beta, gamma = [x.reshape(shape + (-1,)) for x in (alpha, beta, gamma)]
+    # coef 1 goes first inside of every ksi
+    order = valid.reshape(shape + (-1, 2))[..., ::-1].reshape(shape + (-1,))
+    candidates = np.arange(order.shape[-1]).reshape(-1, 2)[:, ::-1].reshape(-1)
+    first = candidates[np.argmax(order, axis=-1)][..., None]
+    found = np.any(order, axis=-1)
+    return [np.take_along_axis(x, first, -1)[..., 0] for x in (alpha, beta, gamma)] + [found]
+
+def solve_frames(feet: np.ndarray, foot_angles: np.ndarray):
+    """
+    IK with known foot angles (alpha + beta + gamma, degrees) of shape (M, 4)
+    for D points in body coordinates of shape (M, 4, 3).
+    Where the foot angle is not reachable, the closest reachable one is taken.
+    Returns servo angles of shape (M, 16) and valid of shape (M)
+    """
+    O = mount_points()
+    tetta = np.arctan2(feet[..., 1] - O[:, 1], feet[..., 0] - O[:, 0])
+    # D is on the ray from O through A, so l is the distance from O without d
+    l = np.hypot(feet[..., 0] - O[:, 0], feet[..., 1] - O[:, 1]) - cfg.leg["d"]
+    delta_z = feet[..., 2] - O[:, 2]
+    alpha, beta, gamma, valid = choose_candidate(*solve_ksi_batch(l[..., None], delta_z[..., None], foot_angles[..., None] + 90))
+
+    rest = ~valid
+    if np.any(rest):
+        offsets = np.repeat(np.arange(1, FOOT_ANGLE_SEARCH + 1), 2) * np.tile([-1, 1], FOOT_ANGLE_SEARCH)
+        ksi = foot_angles[rest][:, None] + 90 + offsets
+        r_alpha, r_beta, r_gamma, r_valid = choose_candidate(*solve_ksi_batch(l[rest][:, None], delta_z[rest][:, None], ksi))
+        alpha[rest], beta[rest], gamma[rest], valid[rest] = r_alpha, r_beta, r_gamma, r_valid
+
+    servo_angles = convert_legs_angles_batch(tetta, alpha, beta, gamma)
+    with np.errstate(invalid='ignore'):
+        valid = np.all(valid, axis=-1) & tettas_correct_batch(servo_angles[:, 3::4])
+    return servo_angles, valid
+
+def build_trajectory(sequence: SnapshotSequence, durations: List[float], rate: float) -> SnapshotSequence:
+    """
+    Frames every 1 / rate seconds from the first snapshot to the last one.
+    durations: seconds between neighbouring snapshots (see segment_durations).
+    A frame IK can not solve is interpolated in joint space.
+    The frame nearest to every snapshot is moved onto it and sent as the snapshot itself.
+    Move type of a frame is the type of the snapshot it moves to
+    """
+    frame_time = 1 / rate
+    # a segment is at least one frame long, so that knots grow
+    knots = np.concatenate([[0], np.cumsum(np.maximum(durations, frame_time))])
+    times = np.arange(0, knots[-1], frame_time)[1:]
+    times = np.append(times, knots[-1])
+    # segments are at least one frame long, so every snapshot gets its own frame
+    keyframes = np.abs(times[:, None] - knots[None, 1:]).argmin(axis=0)
+    times[keyframes] = knots[1:]
+
+    servo_angles = np.asarray(sequence.servo_angles, dtype=float)
+    _, alpha, beta, gamma = convert_legs_angles_to_kinematic_batch(servo_angles)
+    feet = monotone_cubic(knots, feet_points_batch(servo_angles), times)
+    foot_angles = monotone_cubic(knots, np.degrees(alpha + beta + gamma), times)
+    frames, valid = solve_frames(feet, foot_angles)
+
+    if not np.all(valid):
+        linear = np.stack([np.interp(times, knots, servo_angles[:, k]) for k in range(16)], axis=1)
+        frames[~valid] = np.round(linear[~valid], 2)
+    # keyframes themselves, forward and inverse kinematics round them a little
+    frames[keyframes] = servo_angles[1:]
+
+    segments = np.clip(np.searchsorted(knots, times, side='left'), 1, len(knots) - 1)
+    return SnapshotSequence(frames, sequence.move_type_codes[segments])
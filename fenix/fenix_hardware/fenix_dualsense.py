@@ -8,6 +8,7 @@ from hardware.dualsense import DualSense
 from fenix_hardware.neopixel_commands_setter import NeopixelCommandsSetter
 from core.commands_writer import CommandsWriter
 import configs.config as cfg
+import configs.code_config as code_config
 from configs.modes import NIGHT_MODE
 
 
@@ -156,8 +157,24 @@ class FenixDualSense(DualSense):
             else:
                 self.command_writer.write_command('none', 200)
 
+    def write_velocity_command(self, x, y):
+        """
+        Stick forward is moving forward, stick to the right is strafing right (negative y of the body).
+        Velocity is written as parts of the max one, the gait engine knows its limits
+        """
+        if abs(x) < 0.1 and abs(y) < 0.1:
+            self.command_writer.write_velocity(0, 0, 0)
+            self.command_writer.write_command('none', 300)
+            return
+        self.command_writer.write_velocity(y, -x, 0)
+        self.command_writer.write_command('gait', cfg.speed["run"])
+
     def on_left_trigger_change(self, joystick):
         x, y = joystick.x, joystick.y
+        if self.mode == FenixModes.RUN and code_config.gait_engine_enabled:
+            self.write_velocity_command(x, y)
+            return
+
         if abs(x) < 0.1 and abs(y) < 0.1:
             self.command_writer.write_command('none', 300)
             return
@@ -3,12 +3,15 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from hardware.lx16a import LX16A, read_values
+from hardware.bus_executor import BusExecutors
 import logging
 import configs.config as config
 import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
 import logging.config
-logging.config.dictConfig(code_config.logger_config)
+setup_logging()
 from copy import deepcopy
+from typing import List, Tuple
 
 from cybernetic_core.geometry.angles import FenixPosition, build_position_from_servos
 
@@ -29,6 +32,25 @@ class FenixServos:
         # my max speed is for 45 degrees
         # that means that max speed should be 120 for 7.4V+ and 135 for 6V+
         self.servos = [2, 3, 4, 5, 8, 9, 10, 11, 14, 15, 16, 17, 20, 21, 22, 23]
+        self.bus_servos = {
+            self.m1: [2, 3, 4, 5, 20, 21, 22, 23],
+            self.m4: [8, 9, 10, 11, 14, 15, 16, 17],
+        }
+        # buses are independent, with a worker for each they are used at the same time, see on_buses
+        self.bus_executors = BusExecutors([self.m1, self.m4]) if code_config.servo_parallel_buses else None
+        # last angles read from every servo, id -> angle, see read_current_angles
+        self.last_angles = {}
+        # last commanded target of every servo, id -> (angle, rate), see changed_targets
+        self.commanded = {}
+        # how targets of sent poses are read back, see send_command_to_servos
+        self.verification = code_config.servo_write_verification
+        self.poses_sent = 0
+
+    def close(self):
+        # stops bus workers, after it buses are used one after another
+        if self.bus_executors is not None:
+            self.bus_executors.shutdown()
+            self.bus_executors = None
 
     def print_status(self):
         for i in [2, 3, 4, 5, 20, 21, 22, 23]:
@@ -42,35 +64,60 @@ class FenixServos:
         if new_speed > 10000 or new_speed < self.max_speed:
             raise Exception(f'Invalid speed value {new_speed}. Should be between {self.max_speed} and 10000')
         self.speed = new_speed
-        self.logger.info(f'FenixServos. Speed set to {self.speed}')
+        self.logger.info('FenixServos. Speed set to %s', self.speed)
     
+    def on_buses(self, function):
+        # function(bus) for every bus, in parallel if bus executors are used. Returns bus -> result
+        if self.bus_executors is not None:
+            return self.bus_executors.run(function)
+        return {bus: function(bus) for bus in self.bus_servos}
+
     def get_current_angles(self) -> FenixPosition:
-        current_position = FenixPosition(
-            leg1_gamma=self.m1.read_angle(2),
-            leg1_beta=self.m1.read_angle(3),
-            leg1_alpha=self.m1.read_angle(4),
-            leg1_tetta=self.m1.read_angle(5),
-
-            leg2_gamma=self.m4.read_angle(8),
-            leg2_beta=self.m4.read_angle(9),
-            leg2_alpha=self.m4.read_angle(10),
-            leg2_tetta=self.m4.read_angle(11),
-
-            leg3_gamma=self.m4.read_angle(14),
-            leg3_beta=self.m4.read_angle(15),
-            leg3_alpha=self.m4.read_angle(16),
-            leg3_tetta=self.m4.read_angle(17),
-
-            leg4_gamma=self.m1.read_angle(20),
-            leg4_beta=self.m1.read_angle(21),
-            leg4_alpha=self.m1.read_angle(22),
-            leg4_tetta=self.m1.read_angle(23),
-        )
+        if code_config.servo_bulk_read:
+            current_position, _ = self.read_current_angles()
+            return current_position
+
+        angles = {}
+        for bus_angles in self.on_buses(lambda bus: {id: bus.read_angle(id) for id in self.bus_servos[bus]}).values():
+            angles.update(bus_angles)
+        self.last_angles.update(angles)
+        current_position = FenixPosition.from_servo([angles[id] for id in self.servos])
         
-        self.logger.info(f'Read current angles : {current_position}')
+        self.logger.info('Read current angles : %s', current_position)
         
         return current_position
 
+    def read_current_angles(self) -> Tuple[FenixPosition, List[bool]]:
+        """
+        Bulk read of all servos, see LX16A.read_angles, every reply is waited for servo_read_deadline.
+        A servo without a valid reply keeps the last angle read from it and is marked stale,
+        if nothing was read from it yet, it is read with retries.
+        Returns the position and stale flags in servo order
+        """
+        angles = {}
+        deadline = code_config.servo_read_deadline
+        for bus_angles in self.on_buses(lambda bus: bus.read_angles(self.bus_servos[bus], deadline)).values():
+            angles.update(bus_angles)
+
+        stale = []
+        for id in self.servos:
+            if angles[id] is not None:
+                stale.append(False)
+            elif id in self.last_angles:
+                angles[id] = self.last_angles[id]
+                stale.append(True)
+            else:
+                angles[id] = self.get_board_by_id(id).read_angle(id)
+                stale.append(False)
+        self.last_angles.update(angles)
+        current_position = FenixPosition.from_servo([angles[id] for id in self.servos])
+
+        self.logger.info('Read current angles : %s', current_position)
+        if any(stale):
+            self.logger.info('Stale angles of servos %s', tuple(id for id, is_stale in zip(self.servos, stale) if is_stale))
+
+        return current_position, stale
+
     def get_current_angles_old(self):
         current_angles = []
         
@@ -81,7 +128,7 @@ class FenixServos:
             current_angles.append(self.m4.read_angle(i))
             time.sleep(0.0002)
 
-        self.logger.info(f'Read current angles : {current_angles}')
+        self.logger.info('Read current angles : %s', current_angles)
         
         return current_angles
     
@@ -124,12 +171,12 @@ class FenixServos:
             raise ValueError(f'Bad id: {id}')
 
     def enable_torque(self):
-        for id in self.servos:
-            self.get_board_by_id(id).enable_torque(id)
+        self.commanded.clear()
+        self.on_buses(lambda bus: [bus.enable_torque(id) for id in self.bus_servos[bus]])
 
     def disable_torque(self):
-        for id in self.servos:
-            self.get_board_by_id(id).disable_torque(id)
+        self.commanded.clear()
+        self.on_buses(lambda bus: [bus.disable_torque(id) for id in self.bus_servos[bus]])
 
     def set_servo_values(self, angles, rate=0):
         print('Sending values \n{0}'.format(angles))
@@ -140,26 +187,88 @@ class FenixServos:
                 m.move_servo_to_angle(j, angles[j-1], rate)
                 j += 1
     
-    def send_command_to_servos(self, fp: FenixPosition, rate):
-        self.m1.move_servo_to_angle(2, fp.legs[1].gamma, rate)
-        self.m1.move_servo_to_angle(3, fp.legs[1].beta, rate)
-        self.m1.move_servo_to_angle(4, fp.legs[1].alpha, rate)
-        self.m1.move_servo_to_angle(5, fp.legs[1].tetta, rate)
-
-        self.m4.move_servo_to_angle(8, fp.legs[2].gamma, rate)
-        self.m4.move_servo_to_angle(9, fp.legs[2].beta, rate)
-        self.m4.move_servo_to_angle(10, fp.legs[2].alpha, rate)
-        self.m4.move_servo_to_angle(11, fp.legs[2].tetta, rate)
-
-        self.m4.move_servo_to_angle(14, fp.legs[3].gamma, rate)
-        self.m4.move_servo_to_angle(15, fp.legs[3].beta, rate)
-        self.m4.move_servo_to_angle(16, fp.legs[3].alpha, rate)
-        self.m4.move_servo_to_angle(17, fp.legs[3].tetta, rate)
-
-        self.m1.move_servo_to_angle(20, fp.legs[4].gamma, rate)
-        self.m1.move_servo_to_angle(21, fp.legs[4].beta, rate)
-        self.m1.move_servo_to_angle(22, fp.legs[4].alpha, rate)
-        self.m1.move_servo_to_angle(23, fp.legs[4].tetta, rate)
+    def servo_targets(self, fp: FenixPosition):
+        # bus -> [(servo id, angle)] of its servos
+        angles = dict(zip(self.servos, fp.to_servo()))
+        return {bus: [(id, angles[id]) for id in ids] for bus, ids in self.bus_servos.items()}
+
+    def changed_targets(self, fp: FenixPosition, rate):
+        # servo_targets without servos, whose last commanded angle is within servo_write_deadband
+        # of the new one, they already go there. Moves of one leg send a quarter of the pose.
+        # Every servo_full_refresh poses all servos are sent in case a command was lost.
+        # Targets are recorded as commanded by commit_targets, after a bus has sent them
+        if not code_config.servo_shadow_enabled:
+            return self.servo_targets(fp)
+        full_refresh = code_config.servo_full_refresh
+        refresh = full_refresh > 0 and self.poses_sent % full_refresh == 0
+        targets = {}
+        for bus, bus_targets in self.servo_targets(fp).items():
+            targets[bus] = []
+            for id, angle in bus_targets:
+                last = self.commanded.get(id)
+                if refresh or last is None or abs(angle - last[0]) > code_config.servo_write_deadband:
+                    targets[bus].append((id, angle))
+        return targets
+
+    def commit_targets(self, bus_targets, rate):
+        for id, angle in bus_targets:
+            self.commanded[id] = (angle, rate)
+
+    def send_command_to_servos(self, fp: FenixPosition, rate, verification=None):
+        # 'each' reads every target back right after it is written, 16 round trips before the pose is sent.
+        # Otherwise the pose is only written, targets are read back after it: 'frame' - every pose,
+        # 'sampled' - one of every servo_verification_sampling poses, 'none' - never.
+        # verification overrides servo_write_verification for one pose
+        verification = verification or self.verification
+        if code_config.servo_synchronized_start:
+            return self.send_frame_to_servos(fp, rate, verification)
+        verify = verification == 'each'
+        targets = self.changed_targets(fp, rate)
+
+        def send(bus):
+            for id, angle in targets[bus]:
+                bus.move_servo_to_angle(id, angle, rate, verify)
+            self.commit_targets(targets[bus], rate)
+
+        self.on_buses(send)
+        self.pose_sent(verification)
+
+    def send_frame_to_servos(self, fp: FenixPosition, rate, verification=None):
+        # servos started one by one begin moving several ms apart.
+        # Here targets are preloaded on both buses and started by one broadcast per bus,
+        # all joints begin and end the move together
+        verification = verification or self.verification
+        targets = self.changed_targets(fp, rate)
+
+        def preload(bus):
+            for id, angle in targets[bus]:
+                bus.move_servo_to_angle_wait(id, angle, rate)
+            if verification == 'each':
+                # nothing moves yet, preloaded targets are checked before the start
+                bus.verify_targets(started=False)
+
+        def start(bus):
+            if targets[bus]:
+                bus.move_start_all()
+                self.commit_targets(targets[bus], rate)
+
+        # starts are sent after both buses are preloaded, so they go out together
+        self.on_buses(preload)
+        self.on_buses(start)
+        self.pose_sent(verification)
+
+    def pose_sent(self, verification=None):
+        verification = verification or self.verification
+        self.poses_sent += 1
+        if verification == 'frame' or \
+            verification == 'sampled' and self.poses_sent % code_config.servo_verification_sampling == 0:
+            self.verify_targets()
+
+    def verify_targets(self):
+        resent = sum(self.on_buses(lambda bus: bus.verify_targets()).values(), [])
+        if resent:
+            self.logger.info('Targets sent again to servos %s', tuple(resent))
+        return resent
 
     def send_command_to_servos_old(self, angles, rate):
         j = 0
@@ -195,13 +304,13 @@ class FenixServos:
     def set_servo_values_balancing(self, angles, legs=1):
         _, max_angle_diff = self.get_angles_diff(angles)
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
 
         self.send_command_to_servos(angles, rate)
-        self.logger.info(f'Command sent. Rate: {rate}, angles: {angles}')
+        self.logger.info('Command sent. Rate: %s, angles: %s', rate, angles)
         prev_pitch, prev_roll = None, None
         for s in range(30):
-            self.logger.info(f'Step {s}')
+            self.logger.info('Step %s', s)
             
             try:
                 with open('/fenix/fenix/wrk/gyroaccel_data.txt', "r") as f:
@@ -210,17 +319,17 @@ class FenixServos:
                 print(f'Error reading balance:\n{e}')
                 continue
             pitch, roll = float(pitch), float(roll)
-            self.logger.info(f"ga_data: {pitch, roll}")
+            self.logger.info('ga_data: %s', (pitch, roll))
             current_angles = self.get_current_angles()
             
             """
             if prev_pitch and abs(prev_pitch) <= abs(pitch):
-                self.logger.info(f'Body balance moving wrong pitch {prev_pitch, pitch}. Exiting')
+                self.logger.info('Body balance moving wrong pitch %s. Exiting', (prev_pitch, pitch))
                 print(f'Returned current angles inside wrong 1')
                 self.send_command_to_servos(current_angles, 0)
                 return self.get_current_angles()
             if prev_roll and abs(prev_roll) <= abs(roll):
-                self.logger.info(f'Body balance moving wrong roll {prev_roll, roll}. Exiting')
+                self.logger.info('Body balance moving wrong roll %s. Exiting', (prev_roll, roll))
                 print(f'Returned current angles inside wrong 2')
                 self.send_command_to_servos(current_angles, 0)
                 return self.get_current_angles()
@@ -232,8 +341,8 @@ class FenixServos:
             
             if condition:
                 #current_angles = self.get_current_angles()
-                self.logger.info(f'current angles: {current_angles}')
-                self.logger.info(f'Body balanced. Exiting')
+                self.logger.info('current angles: %s', current_angles)
+                self.logger.info('Body balanced. Exiting')
                 self.send_command_to_servos(current_angles, 0)
                 print(f'Returned current angles inside')
                 return current_angles
@@ -258,20 +367,20 @@ class FenixServos:
     def set_servo_values_touching(self, angles, legnum):
         _, max_angle_diff = self.get_angles_diff(angles)
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
 
         self.send_command_to_servos(angles, rate)
-        self.logger.info(f'Command sent. Rate: {rate}, angles: {angles}')
+        self.logger.info('Command sent. Rate: %s, angles: %s', rate, angles)
 
         for s in range(50):
-            self.logger.info(f'Step {s}')
+            self.logger.info('Step %s', s)
             
             with open("/fenix/fenix/wrk/neopixel_command.txt", "r") as f:
                 legs_down = f.readline().split(',')[0]
-            self.logger.info(f"legs_down: {legs_down}")
+            self.logger.info('legs_down: %s', legs_down)
             if len(legs_down) == 4 and legs_down[legnum - 1] == '1':
                 current_angles = self.get_current_angles()
-                self.logger.info(f'current angles: {current_angles}')
+                self.logger.info('current angles: %s', current_angles)
                 print(f'{legnum} down. Exiting')
                 self.send_command_to_servos(current_angles, 0)
                 return current_angles
@@ -282,21 +391,21 @@ class FenixServos:
     def set_servo_values_3leg_touching(self, angles):
         _, max_angle_diff = self.get_angles_diff(angles)
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
 
         self.send_command_to_servos(angles, rate)
-        self.logger.info(f'Command sent. Rate: {rate}, angles: {angles}')
+        self.logger.info('Command sent. Rate: %s, angles: %s', rate, angles)
 
         for s in range(50):
-            self.logger.info(f'Step {s}')
+            self.logger.info('Step %s', s)
             
             with open("/fenix/fenix/wrk/neopixel_command.txt", "r") as f:
                 legs_down = f.readline().split(',')[0]
-            self.logger.info(f"legs_down: {legs_down}")
+            self.logger.info('legs_down: %s', legs_down)
             if legs_down == '1110' or legs_down == '1101' or \
                 legs_down == '1011' or legs_down == '0111':
                 current_angles = self.get_current_angles()
-                self.logger.info(f'current angles: {current_angles}')
+                self.logger.info('current angles: %s', current_angles)
                 print(f'3 legs down: {legs_down}. Exiting')
                 self.send_command_to_servos(current_angles, 0)
                 return current_angles
@@ -308,33 +417,33 @@ class FenixServos:
     def set_servo_values_paced(self, angles):
         _, max_angle_diff = self.get_angles_diff(angles)
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
         prev_angles = self.get_current_angles()
 
         self.send_command_to_servos(angles, rate)
-        self.logger.info(f'Command sent. Rate: {rate}, angles: {angles}')
+        self.logger.info('Command sent. Rate: %s, angles: %s', rate, angles)
         #time.sleep(0.8 * rate / 1000)
         time.sleep(0.05)
         adjustment_done = False
         
         for s in range(50):
-            self.logger.info(f'Step {s}')
+            self.logger.info('Step %s', s)
             #with open("/fenix/fenix/wrk/gyroaccel_data.txt", "r") as f:
             #    ga_data = f.readline()
             #self.logger.info(f"GA_DATA: {ga_data}")
             #time.sleep(0.02)
             
             current_angles = self.get_current_angles()
-            self.logger.info(f'current angles: {current_angles}')
+            self.logger.info('current angles: %s', current_angles)
             # if diff from prev angles or target angles is small - continue
             diff_from_target = self.get_angles_diff(angles, current_angles)
             diff_from_prev = self.get_angles_diff(current_angles, prev_angles)
 
-            self.logger.info(f'Diff from prev  : {diff_from_prev[0]}')
-            self.logger.info(f'Diff from target: {diff_from_target[0]}')
+            self.logger.info('Diff from prev  : %s', diff_from_prev[0])
+            self.logger.info('Diff from target: %s', diff_from_target[0])
      
             if diff_from_target[1] < self.diff_from_target_limit:                
-                self.logger.info(f'Ready to move further')
+                self.logger.info('Ready to move further')
                 break
             
             elif diff_from_prev[1] < self.diff_from_prev_limit and \
@@ -344,15 +453,15 @@ class FenixServos:
                     print('-----------ALARM-----------')
                     self.logger.info('-----------ALARM-----------')
                 
-                self.logger.info(f'Command sent : {angles}')
+                self.logger.info('Command sent : %s', angles)
                 if diff_from_target[1] > self.diff_from_target_limit * 3:
-                    self.logger.info(f'We"re in trouble, too large diff : {diff_from_target[1]}')
+                    self.logger.info('We"re in trouble, too large diff : %s', diff_from_target[1])
                     break
                 else:
                     #adjusted_angles = [round(target + (-1.5 * diff if abs(diff) > self.diff_from_target_limit else 0), 1) for target, diff in zip(angles, diff_from_target[0])]
                     adjusted_angles = [round(target + (-1.5 * diff), 1) for target, diff in zip(angles.to_servo(), diff_from_target[0])]
                     
-                    self.logger.info(f'Adjusting to : {adjusted_angles}')
+                    self.logger.info('Adjusting to : %s', adjusted_angles)
                     fp_adjusted = build_position_from_servos(adjusted_angles)
                     adjustment_done = True
                     self.send_command_to_servos(fp_adjusted, 0)
@@ -361,7 +470,7 @@ class FenixServos:
 
             elif diff_from_prev[1] < self.diff_from_prev_limit and \
                     adjustment_done:
-                self.logger.info(f'Unreachable. Moving further')
+                self.logger.info('Unreachable. Moving further')
                 break
 
             prev_angles = deepcopy(current_angles)
@@ -369,33 +478,33 @@ class FenixServos:
     def set_servo_values_paced_wo_adjustment(self, angles):
         _, max_angle_diff = self.get_angles_diff(angles)
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
         
         self.send_command_to_servos(angles, rate)
-        self.logger.info(f'Command sent. Rate: {rate}, angles: {angles}')
+        self.logger.info('Command sent. Rate: %s, angles: %s', rate, angles)
         #time.sleep(0.8 * rate / 1000)
         time.sleep(0.05)
 
         prev_angles = self.get_current_angles()
         for s in range(50):
-            self.logger.info(f'Step {s}')
+            self.logger.info('Step %s', s)
             #time.sleep(0.02)
             
             current_angles = self.get_current_angles()
-            self.logger.info(f'current angles: {current_angles}')
+            self.logger.info('current angles: %s', current_angles)
             # if diff from prev angles or target angles is small - continue
             diff_from_target = self.get_angles_diff(angles, current_angles)
             diff_from_prev = self.get_angles_diff(current_angles, prev_angles)
 
-            self.logger.info(f'Diff from prev  : {diff_from_prev[0]}')
-            self.logger.info(f'Diff from target: {diff_from_target[0]}')
+            self.logger.info('Diff from prev  : %s', diff_from_prev[0])
+            self.logger.info('Diff from target: %s', diff_from_target[0])
      
             if diff_from_target[1] < self.diff_from_target_limit:                
-                self.logger.info(f'Ready to move further')
+                self.logger.info('Ready to move further')
                 break
             
             elif diff_from_prev[1] < self.diff_from_prev_limit:
-                self.logger.info(f'Unreachable. Moving further')
+                self.logger.info('Unreachable. Moving further')
                 break
 
             prev_angles = current_angles[:]
@@ -403,26 +512,26 @@ class FenixServos:
     def set_servo_values_paced_wo_feedback_w_adjustment(self, angles):
         _, max_angle_diff = self.get_angles_diff(angles)
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
         
         current_angles = self.get_current_angles()
-        self.logger.info(f'current angles: {current_angles}')
+        self.logger.info('current angles: %s', current_angles)
 
         diff_from_target = self.get_angles_diff(angles, current_angles)
 
         adjusted_angles = [round(target + (0.1 * diff), 1) for target, diff in zip(angles, diff_from_target[0])]
 
         self.send_command_to_servos(adjusted_angles, rate)
-        self.logger.info(f'Command sent. Rate: {rate}, angles: {adjusted_angles}')
+        self.logger.info('Command sent. Rate: %s, angles: %s', rate, adjusted_angles)
         time.sleep(rate / 1000)
     
     def set_servo_values_paced_wo_feedback(self, angles):
         _, max_angle_diff = self.get_angles_diff(angles)
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
         
         self.send_command_to_servos(angles, rate)
-        self.logger.info(f'Command sent. Rate: {rate}, angles: {angles}')
+        self.logger.info('Command sent. Rate: %s, angles: %s', rate, angles)
         time.sleep(rate / 1000)
         return self.get_current_angles()
             
@@ -430,7 +539,7 @@ class FenixServos:
         # every command is executed over fixed time (1 sec for speed = 1000)
         self.send_command_to_servos(angles, int(self.speed * 0.9))
         wait_time = max(0, self.speed / 1000 - config.fenix['movement_command_advance_ms'])
-        self.logger.info(f'Wait time : {wait_time}, speed : {int(self.speed * 0.9)}')
+        self.logger.info('Wait time : %s, speed : %s', wait_time, int(self.speed * 0.9))
         time.sleep(wait_time)
 
     def set_servo_values_not_paced_v2(self, fp: FenixPosition, prev_fp: FenixPosition = None):
@@ -439,13 +548,13 @@ class FenixServos:
         rate = round(max(self.speed * max_angle_diff / 45, self.max_speed)) # speed is normalized
         wait_time = max(0, rate / 1000 - config.fenix['movement_command_advance_ms'])
 
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
-        self.logger.info(f'Wait time : {wait_time}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
+        self.logger.info('Wait time : %s', wait_time)
         
         self.send_command_to_servos(fp, rate)
         
         time.sleep(wait_time)
-        self.logger.info(f'[DIFF] Diff with target:')
+        self.logger.info('[DIFF] Diff with target:')
         self.get_angles_diff(fp)
 
     def set_servo_values_overshoot(self, angles, prev_angles=None):
@@ -453,29 +562,54 @@ class FenixServos:
         rate = round(max(self.speed * (1 + config.fenix['movement_overshoot_coefficient']) * max_angle_diff / 45, self.max_speed)) # speed is normalized
         wait_time = max(0, rate / 1000 - config.fenix['movement_command_advance_ms'])
 
-        self.logger.info(f'max_angle_diff: {max_angle_diff}, self.speed : {self.speed}, self.speed * max_angle_diff / 45 : {self.speed * max_angle_diff / 45}')
-        self.logger.info(f'Wait time : {wait_time}')
+        self.logger.info('max_angle_diff: %s, self.speed : %s, self.speed * max_angle_diff / 45 : %s', max_angle_diff, self.speed, self.speed * max_angle_diff / 45)
+        self.logger.info('Wait time : %s', wait_time)
 
         adjusted_angles = [round(target + (config.fenix['movement_overshoot_coefficient'] * diff), 1) for target, diff in zip(angles, angles_diff)]
 
-        self.logger.info(f'{angles} ->\n{adjusted_angles}')
+        self.logger.info('%s ->\n%s', angles, adjusted_angles)
         
         self.send_command_to_servos(adjusted_angles, rate)
         
         time.sleep(wait_time)
-        self.logger.info(f'[DIFF] Diff from target:')
+        self.logger.info('[DIFF] Diff from target:')
         self.get_angles_diff(angles)
     
     def set_servo_values_for_running(self, angles, rate=config.speed["run"]):
         wait_time = max(0, rate / 1000 - config.fenix['movement_command_advance_ms'])
-        self.logger.info(f'Wait time : {wait_time}')
+        self.logger.info('Wait time : %s', wait_time)
         
         self.send_command_to_servos(angles, rate)
         
         time.sleep(wait_time)
-        self.logger.info(f'[DIFF] Diff from target:')
+        self.logger.info('[DIFF] Diff from target:')
         self.get_angles_diff(angles)
 
+    def set_servo_values_scheduled(self, fp: FenixPosition, rate: int, wait_time: float):
+        # rate and wait time are computed for the whole sequence beforehand, see rate_scheduler.py
+        self.logger.info('Rate : %s, wait time : %s', rate, wait_time)
+        self.send_command_to_servos(fp, rate)
+        time.sleep(wait_time)
+
+    def set_servo_values_streamed(self, frames, frame_time: float):
+        # frames of a trajectory are sent on a fixed clock, every one is reached in frame_time.
+        # Frames are written without reading targets back, read-backs do not fit in a frame,
+        # targets of the last frame are verified after the trajectory unless verification is 'none'
+        rate = round(frame_time * 1000)
+        late_frames = 0
+        next_time = time.monotonic()
+        for move_snapshot in frames:
+            self.send_command_to_servos(move_snapshot.angles_snapshot, rate, verification='none')
+            next_time += frame_time
+            wait_time = next_time - time.monotonic()
+            if wait_time > 0:
+                time.sleep(wait_time)
+            else:
+                late_frames += 1
+        self.logger.info('Streamed %s frames, rate : %s, late : %s', len(frames), rate, late_frames)
+        if self.verification != 'none':
+            self.verify_targets()
+
     def get_angles_diff(self, target_position: FenixPosition, test_position: FenixPosition = None):
         if test_position is None:
             test_position = self.get_current_angles()
@@ -484,7 +618,9 @@ class FenixServos:
         for current, target in zip(test_position.to_servo(), target_position.to_servo()):
             angles_diff.append(round(current - target, 2))
         max_angle_diff = max([abs(x) for x in angles_diff])
-        self.logger.info(f'[DIFF] Max : {max_angle_diff}. Avg : {sum([abs(x) for x in angles_diff])/16}. Sum : {sum([abs(x) for x in angles_diff])}')
+        if self.logger.isEnabledFor(logging.INFO):
+            diff_sum = sum([abs(x) for x in angles_diff])
+            self.logger.info('[DIFF] Max : %s. Avg : %s. Sum : %s', max_angle_diff, diff_sum / 16, diff_sum)
         return angles_diff, max_angle_diff
 
 
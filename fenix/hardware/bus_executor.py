@@ -0,0 +1,37 @@
+"""
+One worker thread per serial bus. Buses are independent, so commands to servos
+on different buses can be sent and answered at the same time.
+A bus object (LX16A) is not thread safe, every bus is used only by its own worker.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+
+class BusExecutors:
+    def __init__(self, buses: List):
+        self.buses = buses
+        self.executors = {
+            bus: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'bus_{i}')
+            for i, bus in enumerate(buses)
+        }
+
+    def run(self, function: Callable) -> Dict:
+        """
+        Calls function(bus) for every bus in its worker, waits for all of them.
+        Returns bus -> result, the first exception is raised after all calls finished
+        """
+        futures = {bus: self.executors[bus].submit(function, bus) for bus in self.buses}
+        results, error = {}, None
+        for bus, future in futures.items():
+            try:
+                results[bus] = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+        return results
+
+    def shutdown(self) -> None:
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
@@ -2,12 +2,13 @@
 import time
 from serial import Serial, SerialException
 import struct
-from typing import Union, List
+from typing import Dict, Iterable, Optional, Union, List
 import sys
 import os
 import subprocess
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
 import logging.config
 
 
@@ -78,14 +79,18 @@ class LX16A:
     SERVO_LED_ERROR_WRITE      = 35
     SERVO_LED_ERROR_READ       = 36
 
+    BROADCAST_ID = 254
+
     def __init__(self, port: str = "/dev/ttyUSB0", Baudrate: int = 115200, Timeout: float = 0.001):
-        logging.config.dictConfig(code_config.logger_config)
+        setup_logging()
         self.logger = logging.getLogger('main_logger')
         self.serial = Serial(port, baudrate=Baudrate, timeout=Timeout)
         self.serial.setDTR(1)
         self.TX_DELAY_TIME = 0.00002 
         self.Header = struct.pack("<BB",0x55,0x55)
         self.port = port
+        # targets sent without reading them back, id -> (position, rate, wait), see verify_targets
+        self.unverified_targets = {}
 
     def reset(self) -> None:
         print('............. Resetting .............')
@@ -165,13 +170,23 @@ class LX16A:
         )
         self.send_packet(packet)
 
-    # several attempts are made to send servo to a certain angle
-    # because sometimes command does not work and target stays unchanged
-    def move_servo_to_angle(self, id: int, angle: float, rate: int = 0) -> None:
+    def angle_to_position(self, id: int, angle: float) -> int:
         position = neutral[id] + int(angle/0.24)
         if position < 0:
-            self.logger.error(f'Id : {id}. Target required : {position}. Angle: {angle}')
+            self.logger.error('Id : %s. Target required : %s. Angle: %s', id, position, angle)
             position = 0
+        return position
+
+    # several attempts are made to send servo to a certain angle
+    # because sometimes command does not work and target stays unchanged.
+    # Without verify the command is only written, every read back is a round trip
+    # of several ms, targets are checked later by verify_targets
+    def move_servo_to_angle(self, id: int, angle: float, rate: int = 0, verify: bool = True) -> None:
+        position = self.angle_to_position(id, angle)
+        if not verify:
+            self.move_servo(id, position, rate)
+            self.unverified_targets[id] = (position, rate, False)
+            return
         num_attempts = 3
         for i in range(num_attempts):
             try:
@@ -186,12 +201,47 @@ class LX16A:
                 self.send_packet(packet)
                 target = self.read_servo_target(id)[0]
                 if target != position:
-                    self.logger.info(f'Id : {id}. Target required : {position}. Target real : {target}')
+                    self.logger.info('Id : %s. Target required : %s. Target real : %s', id, position, target)
                     continue
                 break
             except Exception as e:
-                self.logger.info(f'{i} attempt failed for servo {id}. Position: {position}. Angle: {angle}.\n{e}')
-      
+                self.logger.info('%s attempt failed for servo %s. Position: %s. Angle: %s.\n%s', i, id, position, angle, e)
+
+    # preload the target with SERVO_MOVE_TIME_WAIT_WRITE, the servo moves on move_servo_start.
+    # Not read back, see verify_targets
+    def move_servo_to_angle_wait(self, id: int, angle: float, rate: int = 0) -> None:
+        position = self.angle_to_position(id, angle)
+        self.move_servo_wait(id, position, rate)
+        self.unverified_targets[id] = (position, rate, True)
+
+    # start preloaded moves of all servos on the bus with one broadcast packet
+    def move_start_all(self) -> None:
+        self.move_servo_start(self.BROADCAST_ID)
+
+    # read back the last targets sent without verification, send again the ones servos did not get.
+    # Preloaded targets are sent again preloaded, if their move is not started yet, otherwise immediate.
+    # Returns ids of servos the targets were sent again to
+    def verify_targets(self, started: bool = True) -> List[int]:
+        resent = []
+        for id, (position, rate, wait) in self.unverified_targets.items():
+            try:
+                if wait:
+                    target = self.read_servo_target_wait(id)[0]
+                else:
+                    target = self.read_servo_target(id)[0]
+            except Exception as e:
+                self.logger.info('Can not read target from servo %s.\n%s', id, e)
+                target = None
+            if target != position:
+                self.logger.info('Id : %s. Target required : %s. Target real : %s. Sending again', id, position, target)
+                if wait and not started:
+                    self.move_servo_wait(id, position, rate)
+                else:
+                    self.move_servo(id, position, rate)
+                resent.append(id)
+        self.unverified_targets.clear()
+        return resent
+
     # read target position and rate
     def read_servo_target(self, id: int) -> Union[int, int]:
         packet = struct.pack(
@@ -420,18 +470,78 @@ class LX16A:
                 s = struct.unpack("<BBBBBhB", rpacket)
                 return s[5]
             except Exception as e:
-                self.logger.info(f'Can not read values from servo {id}. Attempt {attempt}. \nException : {e}')
+                self.logger.info('Can not read values from servo %s. Attempt %s. \nException : %s', id, attempt, e)
                 self.reset()
             
         raise Exception('Can not read values from servo {0}'.format(id))
 
+    # read positions of several servos one right after another: a request is sent as soon as
+    # the reply to the previous one is parsed, the input is flushed and the timeout is set
+    # once per pass, there are no retries.
+    # The bus is half-duplex, a request can not be sent while a servo replies.
+    # A reply, that is not received in deadline seconds or is broken, is skipped. Its bytes may
+    # still be coming, so they are waited for another deadline and flushed before the next request,
+    # bytes of replies even later than that are skipped by read_reply.
+    # Returns id -> position, None for servos without a valid reply
+    def read_positions(self, ids: Iterable[int], deadline: float) -> Dict[int, Optional[int]]:
+        positions = {}
+        timeout = self.serial.timeout
+        self.serial.timeout = deadline
+        try:
+            self.serial.flushInput()
+            for id in ids:
+                self.send_packet(struct.pack("<BBB", id, 3, self.SERVO_POS_READ))
+                header = struct.pack("<BBBBB", 0x55, 0x55, id, 5, self.SERVO_POS_READ)
+                positions[id] = self.parse_position(id, self.read_reply(header, 8))
+                if positions[id] is None:
+                    time.sleep(deadline)
+                    self.serial.flushInput()
+        finally:
+            self.serial.timeout = timeout
+        return positions
+
+    # read a reply of size bytes starting with header, bytes before it are skipped,
+    # but not more than two replies. Returns what is read, it may be short or without the header
+    def read_reply(self, header: bytes, size: int) -> bytes:
+        data = self.read(size) or b''
+        skipped = 0
+        while True:
+            start = data.find(header)
+            if start < 0:
+                # the end may be the beginning of the header
+                start = max(0, len(data) - len(header) + 1)
+            skipped += start
+            data = data[start:]
+            if data.startswith(header) and len(data) == size or skipped > 2 * size:
+                return data
+            chunk = self.read(size - len(data))
+            if not chunk:
+                return data
+            data += chunk
+
+    def parse_position(self, id: int, rpacket: bytes) -> Optional[int]:
+        if rpacket is None or len(rpacket) != 8:
+            return None
+        s = struct.unpack("<BBBBBhB", rpacket)
+        if s[0:5] != (0x55, 0x55, id, 5, self.SERVO_POS_READ) or (~sum(rpacket[2:7])) & 0xff != s[6]:
+            return None
+        return s[5]
+
+    # angles of several servos, see read_positions. None for servos without a valid reply
+    def read_angles(self, ids: Iterable[int], deadline: float) -> Dict[int, Optional[float]]:
+        angles = {}
+        for id, position in self.read_positions(ids, deadline).items():
+            angle = None if position is None else round((position - neutral[id]) * 0.24 , 2)
+            angles[id] = angle if angle is not None and -150 <= angle <= 150 else None
+        return angles
+
     def read_angle(self, id):
         num_attempts = 5
         for i in range(num_attempts):
             angle = round((self.read_position(id) - neutral[id]) * 0.24 , 2)
             if -150 <= angle <= 150:
                 return angle
-            self.logger.info(f'Attempt to read angle from servo {id} failed. Value : {angle}')
+            self.logger.info('Attempt to read angle from servo %s failed. Value : %s', id, angle)
         raise Exception(f'Could not get correct angle from servo {id} in {num_attempts} attempts.')
 
     # Motor movement with speed : motor_mode = 1 motor_speed = rate
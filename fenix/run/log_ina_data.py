@@ -5,10 +5,11 @@ import time
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from hardware.fnx_ina219 import FNX_INA219
 import configs.code_config as code_config
+from core.utils.logging_setup import setup_logging
 
 
 if __name__ == '__main__':
-    logging.config.dictConfig(code_config.logger_config)
+    setup_logging()
     logger = logging.getLogger('current_sensor_logger')
     ina = FNX_INA219()
     while True: